@@ -0,0 +1,234 @@
+"""
+Headless batch extraction.
+
+Fans auto_extract_with_metrics out over a process pool and writes one
+output per statement plus a manifest.csv summary:
+
+    python batch.py statements/ -o out/ --workers 16
+    python batch.py "2023/**/*.pdf" -o out/ --timeout 600 --format xlsx
+    python batch.py 2023/ -o out/ --consolidate out/2023.parquet
+"""
+import argparse, csv, glob, os, sys, time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+MANIFEST_FIELDS = ["file", "layout", "account", "rows", "coverage", "balance_ok", "seconds",
+                   "output", "error"]
+
+# ─── inputs & outputs ────────────────────────────────────────
+
+def find_pdfs(target: str) -> list:
+    """All PDFs under a directory, or matching a (recursive) glob."""
+    if os.path.isdir(target):
+        target = os.path.join(target, "**", "*.pdf")
+    found = glob.glob(target, recursive=True)
+    return sorted(p for p in found if p.lower().endswith(".pdf") and os.path.isfile(p))
+
+def output_path(pdf_path: str, root: str, out_dir: str, fmt: str) -> str:
+    """Mirror the statement's path below `root` into `out_dir`."""
+    rel = os.path.relpath(os.path.abspath(pdf_path), root)
+    return os.path.join(out_dir, os.path.splitext(rel)[0] + "." + fmt)
+
+def write_output(df, path: str, fmt: str):
+    from export import export
+    export(df, path, fmt)
+
+# ─── worker ──────────────────────────────────────────────────
+
+def extract_one(pdf_path: str, out_path: str, fmt: str = "csv",
+                use_cache: bool = True, keep_frame: bool = False) -> dict:
+    """
+    Run in a worker process: extract one statement and write it to
+    `out_path` (if given). With `keep_frame` the row also carries the
+    DataFrame under "frame".
+    """
+    from extractors import auto_extract_with_metrics
+
+    t0 = time.perf_counter()
+    res = auto_extract_with_metrics(pdf_path, use_cache=use_cache)
+    name, df, total, found, pct = res
+    row = {"file": pdf_path, "layout": name or "", "account": res.metrics.get("account") or "",
+           "rows": found, "coverage": "" if pct != pct else pct, "output": "", "error": ""}
+    if res.metrics.get("balance_checked"):
+        row["balance_ok"] = f"{res.metrics['balance_ok']}/{res.metrics['balance_checked']}"
+    if df.empty:
+        row["error"] = "no extractor matched"
+    else:
+        if out_path:
+            write_output(df, out_path, fmt)
+            row["output"] = out_path
+        if keep_frame:
+            row["frame"] = df
+    row["seconds"] = round(time.perf_counter() - t0, 3)
+    return row
+
+# ─── scheduler ───────────────────────────────────────────────
+
+def _kill(pool: ProcessPoolExecutor):
+    """
+    Stop a pool right away, including workers stuck in a long parse.
+    ProcessPoolExecutor has no public way to do this before 3.14.
+    """
+    for proc in list((getattr(pool, "_processes", None) or {}).values()):
+        proc.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def run_batch(pdfs: list, out_dir: str, workers: int = None, timeout: float = None,
+              retries: int = 1, fmt: str = "csv", use_cache: bool = True,
+              consolidate=None, on_result=None, log=sys.stderr) -> list:
+    """
+    Extract every PDF in `pdfs` and return one manifest row per file,
+    in input order. With `consolidate` (an export writer), every
+    statement is also appended to it, in input order, as soon as the
+    statements before it are done. `on_result(row, frame)` is called
+    for each statement as soon as it finishes (frame None on failure).
+    Without `out_dir` no per-statement files are written.
+
+    At most `workers` files are in flight, so a file's `timeout` clock
+    starts when a worker actually picks it up. A file that overruns
+    its timeout is recorded as failed and the pool is restarted. Files
+    caught in a crashed pool are retried one at a time, so only the file
+    that actually crashes its worker more than `retries` times is
+    recorded as failed; bystanders of a timeout are simply resubmitted.
+    """
+    workers = workers or os.cpu_count() or 1
+    root    = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in pdfs]) if pdfs else "."
+    pending = deque((p, 0) for p in pdfs)
+    results = {}
+    running = {}
+    pool    = ProcessPoolExecutor(max_workers=workers)
+    frames  = {}       # finished statements waiting for their turn to be consolidated
+    written = 0
+
+    def record(row):
+        nonlocal written
+        results[row["file"]] = row
+        frame = row.pop("frame", None)
+        if on_result is not None:
+            on_result(row, frame)
+        if consolidate is not None:
+            frames[row["file"]] = frame
+            while written < len(pdfs) and pdfs[written] in results:
+                frame = frames.pop(pdfs[written], None)
+                if frame is not None:
+                    consolidate.write(frame, source=os.path.relpath(pdfs[written], root))
+                written += 1
+        status = row["error"] or f"{row['layout']} ({row['rows']} rows)"
+        print(f"[batch] {len(results)}/{len(pdfs)} {row['file']}: {status}, "
+              f"{row['seconds']}s", file=log)
+
+    def failed(pdf, error, started):
+        record({"file": pdf, "layout": "", "account": "", "rows": 0, "output": "", "error": error,
+                "seconds": round(time.perf_counter() - started, 3)})
+
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                if pending[0][1] and running:
+                    break
+                pdf, attempt = pending.popleft()
+                out = output_path(pdf, root, out_dir, fmt) if out_dir else None
+                fut = pool.submit(extract_one, pdf, out, fmt, use_cache,
+                                  consolidate is not None or on_result is not None)
+                running[fut] = (pdf, attempt, time.perf_counter())
+                if attempt:
+                    break      # retries run alone, so a crash names its culprit
+
+            wait_for = None
+            if timeout:
+                oldest   = min(started for _, _, started in running.values())
+                wait_for = max(0.0, oldest + timeout - time.perf_counter())
+            done, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            broken = False
+            for fut in done:
+                pdf, attempt, started = running.pop(fut)
+                try:
+                    record(fut.result())
+                except BrokenProcessPool:
+                    broken = True
+                    if attempt < retries:
+                        pending.appendleft((pdf, attempt + 1))
+                    else:
+                        failed(pdf, "worker crashed", started)
+                except Exception as e:
+                    failed(pdf, f"{type(e).__name__}: {e}", started)
+
+            now     = time.perf_counter()
+            overdue = [f for f, (_, _, started) in running.items()
+                       if timeout and now - started >= timeout]
+            for fut in overdue:
+                pdf, _, started = running.pop(fut)
+                failed(pdf, f"timeout after {timeout}s", started)
+
+            if broken or overdue:
+                # the pool is unusable (or holds a hung worker): start over
+                # and resubmit whatever was still running in it
+                _kill(pool)
+                for fut, (pdf, attempt, _) in running.items():
+                    pending.appendleft((pdf, attempt))
+                running.clear()
+                pool = ProcessPoolExecutor(max_workers=workers)
+    finally:
+        if running:
+            _kill(pool)
+        else:
+            pool.shutdown()
+
+    return [results[p] for p in pdfs]
+
+def write_manifest(rows: list, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=MANIFEST_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+# ─── command line ────────────────────────────────────────────
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Extract a directory of bank statements.")
+    ap.add_argument("target", help="directory of PDFs, or a glob such as 'stmts/**/*.pdf'")
+    ap.add_argument("-o", "--out", default="extracted", help="output directory")
+    ap.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                    help="worker processes (default: CPU count)")
+    ap.add_argument("-t", "--timeout", type=float, default=None,
+                    help="seconds allowed per statement")
+    ap.add_argument("-r", "--retries", type=int, default=1,
+                    help="resubmissions after a worker crash")
+    ap.add_argument("-f", "--format", choices=["csv", "xlsx", "parquet"], default="csv")
+    ap.add_argument("-c", "--consolidate", metavar="FILE",
+                    help="also append all statements to one .csv/.xlsx/.parquet file")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="re-extract even if a cached result exists")
+    args = ap.parse_args(argv)
+
+    pdfs = find_pdfs(args.target)
+    if not pdfs:
+        print(f"[batch] no PDFs found in {args.target}", file=sys.stderr)
+        return 1
+
+    consolidate = None
+    if args.consolidate:
+        from export import open_writer
+        from extractors import COLUMNS
+        consolidate = open_writer(args.consolidate, columns=COLUMNS, source="Archivo")
+
+    t0 = time.perf_counter()
+    try:
+        rows = run_batch(pdfs, args.out, args.workers, args.timeout, args.retries,
+                         args.format, use_cache=not args.no_cache, consolidate=consolidate)
+    finally:
+        if consolidate is not None:
+            consolidate.close()
+    manifest = os.path.join(args.out, "manifest.csv")
+    write_manifest(rows, manifest)
+
+    errors = sum(1 for r in rows if r["error"])
+    print(f"[batch] {len(rows)-errors}/{len(rows)} extracted in "
+          f"{time.perf_counter()-t0:.1f}s; manifest: {manifest}", file=sys.stderr)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
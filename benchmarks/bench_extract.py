@@ -0,0 +1,204 @@
+"""
+Extraction benchmark on synthetic statements.
+
+For every layout in EXTRACTORS and every page count, generates a
+statement (benchmarks/synthetic.py, cached in --fixtures) and times,
+each in a fresh interpreter:
+
+    extractor   the layout's own extractor
+    auto        auto_extract, cold
+    auto-warm   auto_extract_with_metrics answered by the result cache
+
+reporting seconds (best of --runs), pages/s, rows/s and peak RSS.
+Every case must extract exactly the transactions the generator wrote;
+a mismatch stops the run (exit 1) rather than timing a failed parse,
+and a case that crashes fails the run once the others have finished.
+Results can be saved as a baseline and later runs compared with it;
+a case slower than the baseline by more than --tolerance (and
+--min-delta seconds), crashed, or in the baseline but not run fails
+the comparison (exit 1), so compare runs over the same layouts, pages
+and cases. No baseline ships with the repository: save one on the
+machine that will run the comparisons.
+
+    python benchmarks/bench_extract.py          # every layout at 1, 10, 100, 500 pages
+    python benchmarks/bench_extract.py --pages 1 10 --save-baseline base.json
+    python benchmarks/bench_extract.py --pages 1 10 --baseline base.json
+    python benchmarks/bench_extract.py --layouts bbva banbajio --cases auto
+"""
+import argparse, json, os, resource, subprocess, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+PAGES    = (1, 10, 100, 500)
+CASES    = ("extractor", "auto", "auto-warm")
+FIXTURES = os.path.join(tempfile.gettempdir(), "bse-bench-fixtures")
+
+# ─── one measurement (child process) ─────────────────────────
+
+def measure(case: str, layout: str, pdf_path: str) -> dict:
+    """Time one case in this process; the cache lives in a private temp dir."""
+    sys.path.insert(0, ROOT)
+    import extractors
+
+    if case == "extractor":
+        fn = dict(extractors.EXTRACTORS)[layout]
+        t0 = time.perf_counter()
+        rows = len(fn(pdf_path))
+    elif case == "auto":
+        t0 = time.perf_counter()
+        rows = len(extractors.auto_extract(pdf_path))
+    else:
+        extractors.auto_extract_with_metrics(pdf_path)        # fill the cache
+        t0  = time.perf_counter()
+        res = extractors.auto_extract_with_metrics(pdf_path)
+        if not res.metrics.get("cached"):
+            raise RuntimeError("result cache did not answer the warm run")
+        rows = res[3]
+    seconds = time.perf_counter() - t0
+    return {"seconds": seconds, "rows": rows,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+def run_case(case: str, layout: str, pdf_path: str, runs: int) -> dict:
+    """Best of `runs` fresh interpreters; peak RSS is the largest seen."""
+    seen = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as cache:
+            env = dict(os.environ, BSE_CACHE_DIR=cache)
+            for var in ("BSE_TRACE_DIR", "BSE_PROFILE", "BSE_TRACE_MEMORY"):
+                env.pop(var, None)
+            out = subprocess.run([sys.executable, __file__, "--child", case, layout, pdf_path],
+                                 env=env, capture_output=True, text=True)
+        if out.returncode:
+            raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr else "failed")
+        seen.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    best = min(seen, key=lambda r: r["seconds"])
+    best["peak_rss_mb"] = max(r["peak_rss_mb"] for r in seen)
+    return best
+
+# ─── suite ───────────────────────────────────────────────────
+
+def fixture(layout: str, pages: int, folder: str) -> tuple:
+    """
+    (path, transactions written) of the synthetic statement, generated
+    on first use; the count is kept next to the PDF.
+    """
+    from synthetic import VERSION, statement
+    path = os.path.join(folder, f"{layout}_{pages}_v{VERSION}.pdf")
+    if not os.path.exists(path) or not os.path.exists(path + ".rows"):
+        os.makedirs(folder, exist_ok=True)
+        rows = statement(layout, path + ".tmp", pages)
+        os.replace(path + ".tmp", path)
+        with open(path + ".rows", "w") as fh:
+            fh.write(str(rows))
+    with open(path + ".rows") as fh:
+        return path, int(fh.read())
+
+def key(layout: str, pages: int, case: str) -> str:
+    return f"{layout}/{pages}/{case}"
+
+def run_suite(layouts, pages, cases, runs: int, folder: str, log=sys.stdout) -> dict:
+    """key → measurement, or {"error": message} for a case that crashed."""
+    results = {}
+    print(f"{'layout':<14}{'pages':>6}  {'case':<10}{'seconds':>9}{'pages/s':>10}"
+          f"{'rows/s':>10}{'rows':>7}{'RSS MB':>8}", file=log)
+    for layout in layouts:
+        for n in pages:
+            path, written = fixture(layout, n, folder)
+            for case in cases:
+                try:
+                    res = run_case(case, layout, path, runs)
+                except RuntimeError as e:
+                    results[key(layout, n, case)] = {"error": str(e)}
+                    print(f"{layout:<14}{n:>6}  {case:<10}  error: {e}", file=log)
+                    continue
+                if res["rows"] != written:
+                    raise RuntimeError(f"{key(layout, n, case)}: extracted {res['rows']} "
+                                       f"of {written} transactions")
+                s = max(res["seconds"], 1e-9)
+                res.update(pages=n, pages_per_s=n / s, rows_per_s=res["rows"] / s)
+                results[key(layout, n, case)] = res
+                print(f"{layout:<14}{n:>6}  {case:<10}{res['seconds']:>9.3f}"
+                      f"{res['pages_per_s']:>10.1f}{res['rows_per_s']:>10.0f}"
+                      f"{res['rows']:>7}{res['peak_rss_mb']:>8.0f}", file=log, flush=True)
+    return results
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta: float = 0.05,
+            log=sys.stdout) -> list:
+    """
+    Print the change against the baseline; returns the regressions:
+    cases slower by more than `tolerance` and `min_delta` seconds (so
+    timer noise on tiny cases does not count), with a different number
+    of rows, crashed, or in the baseline but missing from `results`.
+    """
+    regressions = []
+    print(f"\n{'case':<34}{'baseline':>10}{'now':>10}{'change':>9}", file=log)
+    for k, base in baseline.items():
+        res = results.get(k)
+        if res is None or "error" in res:
+            regressions.append(f"{k} " + (f"crashed: {res['error']}" if res else "not run"))
+            print(f"{k:<34}{base['seconds']:>10.3f}{'-':>10}{'-':>9}  "
+                  f"{'CRASHED' if res else 'MISSING'}", file=log)
+            continue
+        change = res["seconds"] / max(base["seconds"], 1e-9) - 1
+        flag = ""
+        if change > tolerance and res["seconds"] - base["seconds"] > min_delta:
+            regressions.append(f"{k} {change:+.0%}")
+            flag = "  SLOWER"
+        elif res["rows"] != base["rows"]:
+            regressions.append(f"{k} rows {base['rows']} -> {res['rows']}")
+            flag = "  ROWS"
+        print(f"{k:<34}{base['seconds']:>10.3f}{res['seconds']:>10.3f}{change:>+9.0%}{flag}",
+              file=log)
+    return regressions
+
+# ─── command line ────────────────────────────────────────────
+
+def main(argv=None) -> int:
+    sys.path.insert(0, HERE)
+    sys.path.insert(0, ROOT)
+    from synthetic import LAYOUTS
+
+    ap = argparse.ArgumentParser(description="Benchmark the extractors on synthetic statements.")
+    ap.add_argument("--layouts", nargs="+", default=list(LAYOUTS), choices=LAYOUTS)
+    ap.add_argument("--pages", nargs="+", type=int, default=list(PAGES))
+    ap.add_argument("--cases", nargs="+", default=list(CASES), choices=CASES)
+    ap.add_argument("-n", "--runs", type=int, default=1, help="fresh interpreters per case")
+    ap.add_argument("--fixtures", default=FIXTURES, help="where generated PDFs are kept")
+    ap.add_argument("--save-baseline", metavar="FILE", help="write the results as a baseline")
+    ap.add_argument("--baseline", metavar="FILE", help="compare with a saved baseline")
+    ap.add_argument("--tolerance", type=float, default=0.25,
+                    help="allowed slowdown against the baseline (0.25 = 25%%)")
+    ap.add_argument("--min-delta", type=float, default=0.05,
+                    help="slowdowns under this many seconds are never regressions")
+    args = ap.parse_args(argv)
+
+    try:
+        results = run_suite(args.layouts, args.pages, args.cases, args.runs, args.fixtures)
+    except RuntimeError as e:
+        print(f"[bench] {e}", file=sys.stderr)
+        return 1
+    crashed = {k: res["error"] for k, res in results.items() if "error" in res}
+    for k, error in crashed.items():
+        print(f"[bench] CRASHED: {k}: {error}", file=sys.stderr)
+    if args.save_baseline:
+        timed = {k: res for k, res in results.items() if k not in crashed}
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w", encoding="utf-8") as fh:
+            json.dump({"python": sys.version.split()[0], "results": timed}, fh, indent=2)
+        print(f"\n[bench] baseline written to {args.save_baseline}", file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)["results"]
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        for r in regressions:
+            print(f"[bench] REGRESSION: {r}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 1 if crashed else 0
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        print(json.dumps(measure(*sys.argv[2:5])))
+    else:
+        sys.exit(main())
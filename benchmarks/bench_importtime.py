@@ -0,0 +1,72 @@
+"""
+Import-time benchmark: guards the GUI's cold start.
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters
+and reports the best cumulative import time of each module, plus the
+slowest imports it pulled in. Fails (exit 1) if a module is over its
+budget or loads one of the heavy dependencies it should defer:
+
+    python benchmarks/bench_importtime.py
+    python benchmarks/bench_importtime.py --runs 10 --budget-ms 200 --top 15
+"""
+import argparse, os, subprocess, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module → (budget in ms, packages it must not import at load)
+TARGETS = {
+    "gui":         (250, ("pandas", "numpy", "pdfplumber", "camelot", "cv2", "extractors")),
+    "extractors":  (None, ("camelot", "cv2")),
+}
+
+def import_times(module: str) -> dict:
+    """Cumulative import time in µs of every module loaded by `import module`."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         cwd=ROOT, capture_output=True, text=True, check=True).stderr
+    times = {}
+    for line in out.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+def bench(module: str, runs: int) -> tuple:
+    """Best of `runs`: (total ms, {module: µs} of that run)."""
+    best = None
+    for _ in range(runs):
+        times = import_times(module)
+        if best is None or times[module] < best[module]:
+            best = times
+    return best[module] / 1000, best
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Measure import time of the app modules.")
+    ap.add_argument("modules", nargs="*", default=list(TARGETS))
+    ap.add_argument("-n", "--runs", type=int, default=5, help="fresh interpreters per module")
+    ap.add_argument("--budget-ms", type=float, default=None,
+                    help="override every module's budget")
+    ap.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = ap.parse_args(argv)
+
+    failures = []
+    for module in args.modules:
+        budget, forbidden = TARGETS.get(module, (None, ()))
+        budget = args.budget_ms if args.budget_ms is not None else budget
+        total, times = bench(module, args.runs)
+        print(f"{module}: {total:.1f} ms" + (f" (budget {budget:.0f} ms)" if budget else ""))
+        for name, us in sorted(times.items(), key=lambda kv: -kv[1])[1:args.top+1]:
+            print(f"    {us/1000:>8.1f} ms  {name}")
+        if budget and total > budget:
+            failures.append(f"{module} took {total:.1f} ms, budget {budget:.0f} ms")
+        loaded = sorted({n.split(".")[0] for n in times} & set(forbidden))
+        if loaded:
+            failures.append(f"{module} imports {', '.join(loaded)} at load time")
+
+    for f in failures:
+        print(f"[bench] FAIL: {f}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
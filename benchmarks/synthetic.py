@@ -0,0 +1,133 @@
+"""
+Synthetic statements for the tests and benchmarks.
+
+A minimal PDF writer (one Helvetica text layer, no dependencies) and a
+generator that lays out transactions the way each of the six layouts
+in extractors.EXTRACTORS prints them, with a consistent running
+balance that never goes negative. Output is deterministic for a given
+seed:
+
+    python benchmarks/synthetic.py bbva 100 /tmp/bbva_100.pdf
+"""
+import random, sys
+
+VERSION   = 1          # bump when the generated statements change
+PAGE_SIZE = (612, 792)
+ACCOUNT   = "0123456789"
+OPENING   = 10000.0      # balance before the first transaction
+TOP, BOTTOM, LEADING = 730, 40, 12
+
+# header words and their x positions, per layout
+HEADERS = {
+    "banorte0":     [(40, "FECHA"), (110, "DESCRIPCIÓN"), (380, "DEPÓSITOS"), (460, "RETIROS"),
+                     (540, "SALDO")],
+    "banorte1":     [(40, "FECHA"), (110, "DESCRIPCIÓN"), (380, "DEPÓSITOS"), (460, "RETIROS"),
+                     (540, "SALDO")],
+    "citibanamex0": [(40, "FECHA"), (110, "CONCEPTO"), (380, "RETIROS"), (460, "DEPOSITOS"),
+                     (540, "SALDO")],
+    "citibanamex1": [(40, "FECHA  CONCEPTO                       RETIROS  DEPOSITOS  SALDO")],
+    "banbajio":     [(40, "FECHA"), (90, "NO. REF."), (160, "DESCRIPCION DE LA OPERACION"),
+                     (380, "DEPOSITOS"), (460, "RETIROS"), (540, "SALDO")],
+    "bbva":         [(40, "OPER"), (90, "LIQ DESCRIPCIÓN"), (330, "CARGOS"), (400, "ABONOS"),
+                     (470, "OPERACIÓN"), (540, "LIQUIDACIÓN")],
+}
+LAYOUTS = tuple(HEADERS)
+
+def write_pdf(path: str, pages: list, size: tuple = PAGE_SIZE):
+    """Write a PDF whose pages are lists of (x, y, text) items."""
+    objs = []
+    def add(body: bytes) -> int:
+        objs.append(body)
+        return len(objs)
+
+    font     = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+                   b"/Encoding /WinAnsiEncoding >>")
+    pages_id = len(objs) + 1 + 2*len(pages)      # /Pages goes after every page pair
+    kids = []
+    for items in pages:
+        ops = []
+        for x, y, text in items:
+            s = text.encode("cp1252").replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+            ops.append(b"BT /F1 8 Tf %d %d Td (" % (x, y) + s + b") Tj ET")
+        data = b"\n".join(ops)
+        content = add(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+        kids.append(add(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] "
+                        b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+                        % (pages_id, size[0], size[1], font, content)))
+    add(b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % k for k in kids) +
+        b"] /Count %d >>" % len(kids))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for i, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += (b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objs) + 1, catalog, xref))
+    with open(path, "wb") as fh:
+        fh.write(bytes(out))
+
+def _amount(a: float) -> str:
+    return "{:,.2f}".format(a)
+
+def statement(layout: str, path: str, pages: int = 3, rows: int = 50, seed: int = 1) -> int:
+    """
+    Write a `pages`-page statement in `layout` with up to `rows`
+    transactions per page (fewer when they do not fit); returns the
+    number of transactions written.
+    """
+    rnd, out, bal, count = random.Random(seed), [], OPENING, 0
+    for p in range(pages):
+        items = [(40, 770, f"ESTADO DE CUENTA  No. de Cuenta {ACCOUNT}  "
+                           f"PERIODO DEL 01/01/2023 AL 31/01/2023")]
+        y = TOP
+        items += [(x, y, t) for x, t in HEADERS[layout]]
+        y -= LEADING
+        if layout == "banbajio":
+            items.append((160, y, "(detalle)"))
+            y -= LEADING
+        for r in range(rows):
+            if y < BOTTOM + (2*LEADING if layout == "citibanamex1" else 0):
+                break
+            dep = rnd.random() < 0.4
+            a   = round(rnd.uniform(10, 900), 2)
+            dep = dep or bal - a < 0    # the balance stays positive: no amount prints a sign
+            bal += a if dep else -a
+            d    = r % 28 + 1
+            if layout in ("banorte0", "banorte1"):
+                items += [(40, y, "%02d-ENE-23" % d), (110, y, "PAGO SPEI %d-%d" % (p, r)),
+                          (380 if dep else 460, y, _amount(a)), (540, y, _amount(bal))]
+                if layout == "banorte1" and r % 5 == 0 and y - LEADING >= BOTTOM:
+                    y -= LEADING
+                    items.append((40, y, "CONT %d" % r))
+            elif layout == "citibanamex0":
+                items += [(40, y, "%02d ENE" % d), (110, y, "PAGO SERVICIO %d-%d" % (p, r)),
+                          (460 if dep else 380, y, _amount(a)), (540, y, _amount(bal))]
+            elif layout == "banbajio":
+                items += [(40, y, "%d ENE" % d), (90, y, str(100000 + r)),
+                          (160, y, "TRASPASO %d-%d" % (p, r)),
+                          (380 if dep else 460, y, _amount(a)), (540, y, _amount(bal))]
+            elif layout == "bbva":
+                items += [(40, y, "%02d/ENE" % d), (90, y, "%02d/ENE PAGO TDC %d-%d" % (d, p, r)),
+                          (400 if dep else 330, y, _amount(a)), (470, y, _amount(bal)),
+                          (540, y, _amount(bal))]
+            else:       # citibanamex1: date line, branch line, HORA line with the amounts
+                items.append((40, y, "%d ENE %s %d-%d" % (d, "DEPOSITO EFECTIVO" if dep
+                                                          else "PAGO TARJETA", p, r)))
+                items.append((40, y - LEADING, "SUC 0123 CAJA 4"))
+                y -= 2*LEADING
+                items.append((40, y, "HORA 12:%02d AUT %06d  %s  %s"
+                              % (r % 60, r, _amount(a), _amount(bal))))
+            y -= LEADING
+            count += 1
+        out.append(items)
+    write_pdf(path, out)
+    return count
+
+if __name__ == "__main__":
+    layout, pages, path = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+    print(statement(layout, path, pages), "transactions written to", path)
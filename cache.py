@@ -0,0 +1,136 @@
+"""
+Content-addressed on-disk cache of extraction results.
+
+Entries are keyed by the SHA-256 of the PDF bytes plus the layout that
+matched and that layout's version (its spec plus the engine code and
+settings, see extractors.layout_version), so editing one layout's spec
+only invalidates that layout's entries, and editing the engine, the
+layout detection or its settings all of them. Frames are stored as
+Parquet, the index in SQLite, and the least recently used entries are
+evicted once the cache outgrows its size limit.
+"""
+import hashlib, json, os, sqlite3, time
+import pandas as pd
+
+CACHE_DIR       = os.environ.get("BSE_CACHE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".cache", "bank-statement-extractor")
+CACHE_MAX_BYTES = int(os.environ.get("BSE_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+def file_digest(path: str, block: int = 1 << 20) -> str:
+    """SHA-256 of the file contents."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(block), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class ResultCache:
+    """
+    Cache of auto_extract_with_metrics results.
+
+    `versions` maps each layout name to its current code version. An
+    entry is only served if its layout's version still matches; stale
+    entries are dropped when found. A document no layout matched is
+    stored under layout "" with the version of all layouts together.
+    """
+
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.root      = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(root, "index.sqlite"), timeout=30)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS entries (
+                               digest  TEXT NOT NULL,
+                               layout  TEXT NOT NULL,
+                               version TEXT NOT NULL,
+                               file    TEXT,
+                               size    INTEGER NOT NULL,
+                               meta    TEXT NOT NULL,
+                               used    REAL NOT NULL,
+                               PRIMARY KEY (digest, layout))""")
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, digest: str, versions: dict):
+        """
+        Return (layout, df, meta) for a fresh entry of this document,
+        or None on a miss.
+        """
+        rows = self.db.execute("SELECT layout, version, file, meta FROM entries "
+                               "WHERE digest=?", (digest,)).fetchall()
+        for layout, version, file, meta in rows:
+            if version != versions.get(layout):
+                self._drop(digest, layout, file)
+                continue
+            if file:
+                try:
+                    df = pd.read_parquet(os.path.join(self.root, file))
+                except OSError:
+                    self._drop(digest, layout, file)
+                    continue
+            else:
+                df = pd.DataFrame()
+            with self.db:
+                self.db.execute("UPDATE entries SET used=? WHERE digest=? AND layout=?",
+                                (time.time(), digest, layout))
+            return layout or None, df, json.loads(meta)
+        return None
+
+    def put(self, digest: str, layout: str, version: str, df: pd.DataFrame, meta: dict):
+        """Store a result, then evict old entries if over the size limit."""
+        layout = layout or ""
+        file, size = None, 0
+        if not df.empty:
+            file = f"{digest}-{layout}-{version}.parquet"
+            path = os.path.join(self.root, file)
+            tmp  = f"{path}.{os.getpid()}.tmp"
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+            size = os.path.getsize(path)
+        old = self.db.execute("SELECT file FROM entries WHERE digest=? AND layout=?",
+                              (digest, layout)).fetchone()
+        if old and old[0] and old[0] != file:
+            self._unlink(old[0])
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO entries VALUES (?,?,?,?,?,?,?)",
+                            (digest, layout, version, file, size,
+                             json.dumps(meta, default=str), time.time()))
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits max_bytes."""
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for digest, layout, file, size in self.db.execute(
+                "SELECT digest, layout, file, size FROM entries ORDER BY used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._drop(digest, layout, file)
+            total -= size
+
+    def clear(self):
+        for digest, layout, file in self.db.execute(
+                "SELECT digest, layout, file FROM entries").fetchall():
+            self._drop(digest, layout, file)
+
+    def _drop(self, digest: str, layout: str, file: str):
+        with self.db:
+            self.db.execute("DELETE FROM entries WHERE digest=? AND layout=?",
+                            (digest, layout))
+        if file:
+            self._unlink(file)
+
+    def _unlink(self, file: str):
+        try:
+            os.remove(os.path.join(self.root, file))
+        except OSError:
+            pass
@@ -0,0 +1,232 @@
+"""
+Streaming export of extracted transactions.
+
+Writers take DataFrame chunks one at a time (a page from
+iter_transactions, or a whole statement) and only ever hold the chunk
+being written: CSV is appended chunk by chunk, Excel goes through
+openpyxl's write-only mode with number and date formats, and Parquet
+gets one row group per chunk through a pyarrow ParquetWriter. Amounts
+arrive as Int64 cents; CSV and Excel get currency units, Parquet exact
+decimal(18, 2). Many statements can be appended into one consolidated
+file:
+
+    with open_writer("2023.xlsx", columns=COLUMNS, source="Archivo") as out:
+        for pdf in pdfs:
+            for chunk in iter_transactions(pdf):
+                out.write(chunk, source=os.path.basename(pdf))
+"""
+import os, sys
+import pandas as pd
+
+from extractors import AMOUNT_COLUMNS, DATE_COLUMNS, to_units
+
+FORMATS      = ("csv", "xlsx", "parquet")
+CSV_DATE     = "%Y-%m-%d"
+XLSX_DATE    = "yyyy-mm-dd"
+XLSX_AMOUNT  = "#,##0.00"
+XLSX_MAXROWS = 1048576     # rows per worksheet, header included
+
+def format_of(path: str) -> str:
+    """Export format from a file name's extension."""
+    fmt = os.path.splitext(path)[1].lower().lstrip(".")
+    fmt = {"xls": "xlsx", "pq": "parquet"}.get(fmt, fmt)
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format for {path!r} (use {', '.join(FORMATS)})")
+    return fmt
+
+class Writer:
+    """
+    Base of the streaming writers.
+
+    The column set is fixed by `columns`, or else by the first chunk;
+    later chunks are aligned to it (missing columns left empty; unknown
+    ones dropped, with a warning). With `source`, a first column of
+    that name holds the `source` passed to each write().
+    """
+
+    def __init__(self, path: str, columns=None, source: str = None):
+        self.path    = path
+        self.columns = list(columns) if columns is not None else None
+        self.source  = source
+        self.rows    = 0
+        self._dropped = set()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, df: pd.DataFrame, source: str = None):
+        if self.columns is None:
+            self.columns = list(df.columns)
+        extra = set(df.columns) - set(self.columns) - self._dropped
+        if extra:
+            print(f"[export] {self.path}: dropping columns {sorted(extra)}", file=sys.stderr)
+            self._dropped |= extra
+        df = df.reindex(columns=self.columns)
+        for col in df.columns:
+            if col in AMOUNT_COLUMNS:
+                df[col] = df[col].astype("Int64")
+            elif col in DATE_COLUMNS:
+                df[col] = pd.to_datetime(df[col], errors="coerce")
+        if self.source:
+            df.insert(0, self.source, source)
+        if len(df):
+            self._write(df)
+            self.rows += len(df)
+
+    @property
+    def header(self) -> list:
+        return ([self.source] if self.source else []) + self.columns
+
+    def _write(self, df: pd.DataFrame):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class CsvWriter(Writer):
+    """UTF-8 CSV with BOM (opens cleanly in Excel), appended per chunk."""
+
+    def __init__(self, path: str, columns=None, source: str = None):
+        super().__init__(path, columns, source)
+        self._fh = open(path, "w", newline="", encoding="utf-8-sig")
+
+    def _write(self, df):
+        to_units(df).to_csv(self._fh, index=False, header=self._fh.tell() == 0,
+                  date_format=CSV_DATE)
+
+    def close(self):
+        if not self._fh.closed:
+            if self._fh.tell() == 0 and self.columns is not None:
+                self._fh.write(",".join(self.header) + "\n")
+            self._fh.close()
+
+class XlsxWriter(Writer):
+    """
+    Excel through openpyxl's write-only mode: rows go straight to the
+    zip stream. Amounts get a thousands format and dates a date format;
+    past Excel's row limit the data continues on a new sheet.
+    """
+
+    def __init__(self, path: str, columns=None, source: str = None):
+        super().__init__(path, columns, source)
+        from openpyxl import Workbook
+        self._wb   = Workbook(write_only=True)
+        self._ws   = None
+        self._used = 0
+        self._styled = None     # reusable formatted cells of the current sheet
+
+    def _sheet(self):
+        if self._ws is None or self._used >= XLSX_MAXROWS:
+            n = len(self._wb.worksheets)
+            self._ws   = self._wb.create_sheet("Transacciones" + (str(n + 1) if n else ""))
+            self._ws.append(self.header)
+            self._used = 1
+            self._styled = None
+        return self._ws
+
+    def _write(self, df):
+        formats = [XLSX_AMOUNT if c in AMOUNT_COLUMNS else XLSX_DATE if c in DATE_COLUMNS
+                   else None for c in df.columns]
+        dates   = [c for c in df.columns if c in DATE_COLUMNS]
+        df = to_units(df).astype({c: object for c in dates})
+        df = df.where(df.notna(), None)
+        for row in df.itertuples(index=False, name=None):
+            ws = self._sheet()
+            if self._styled is None:
+                # write-only rows are serialized on append, so one styled
+                # cell per column can be reused for every row
+                from openpyxl.cell import WriteOnlyCell
+                self._styled = [None if fmt is None else WriteOnlyCell(ws) for fmt in formats]
+                for cell, fmt in zip(self._styled, formats):
+                    if cell is not None:
+                        cell.number_format = fmt
+            cells = list(row)
+            for i, cell in enumerate(self._styled):
+                if cell is not None and cells[i] is not None:
+                    cell.value = cells[i]
+                    cells[i]   = cell
+            ws.append(cells)
+            self._used += 1
+
+    def close(self):
+        if self._wb is not None:
+            if self._ws is None and self.columns is not None:
+                self._sheet()       # header row even when nothing was written
+            elif not self._wb.worksheets:
+                self._wb.create_sheet("Transacciones")
+            self._wb.save(self.path)
+            self._wb = None
+
+class ParquetWriter(Writer):
+    """Parquet with one row group per chunk and a schema fixed up front."""
+
+    def __init__(self, path: str, columns=None, source: str = None):
+        super().__init__(path, columns, source)
+        self._pq = None
+
+    def _schema(self):
+        import pyarrow as pa
+        def kind(c):
+            if c in AMOUNT_COLUMNS:
+                return pa.decimal128(18, 2)
+            if c in DATE_COLUMNS:
+                return pa.timestamp("us")
+            return pa.string()
+        return pa.schema([(c, kind(c)) for c in self.header])
+
+    def _write(self, df):
+        import pyarrow as pa, pyarrow.parquet as pq
+        if self._pq is None:
+            self._pq = pq.ParquetWriter(self.path, self._schema())
+        schema  = self._pq.schema
+        amounts = [c for c in df.columns if c in AMOUNT_COLUMNS]
+        text    = [c for c in df.columns if c not in AMOUNT_COLUMNS and c not in DATE_COLUMNS]
+        df      = df.astype({c: object for c in text})
+        df[text] = df[text].where(df[text].isna(), df[text].astype(str))
+        table   = pa.Table.from_pandas(df.drop(columns=amounts),
+                                       schema=pa.schema([f for f in schema if f.name not in amounts]),
+                                       preserve_index=False)
+        for c in amounts:
+            table = table.add_column(schema.get_field_index(c), schema.field(c), _decimal(df[c]))
+        self._pq.write_table(table)
+
+    def close(self):
+        if self._pq is None and self.columns is not None:
+            import pyarrow.parquet as pq
+            self._pq = pq.ParquetWriter(self.path, self._schema())
+        if self._pq is not None:
+            self._pq.close()
+            self._pq = None
+
+def _decimal(cents: pd.Series):
+    """Int64 cents as a decimal(18, 2) Arrow array, exactly: decimal128
+    stores the unscaled value as a 128-bit integer, so the cents are the
+    low word and their sign extension the high word."""
+    import numpy as np, pyarrow as pa
+    na    = cents.isna().to_numpy()
+    low   = cents.fillna(0).to_numpy(dtype=np.int64)
+    words = np.empty((len(low), 2), dtype=np.int64)
+    words[:, 0] = low
+    words[:, 1] = low >> 63
+    mask  = pa.array(~na).buffers()[1] if na.any() else None
+    return pa.Array.from_buffers(pa.decimal128(18, 2), len(low),
+                                 [mask, pa.py_buffer(words.tobytes())])
+
+WRITERS = {"csv": CsvWriter, "xlsx": XlsxWriter, "parquet": ParquetWriter}
+
+def open_writer(path: str, fmt: str = None, columns=None, source: str = None) -> Writer:
+    """Streaming writer for `path`; the format defaults to the file extension."""
+    return WRITERS[fmt or format_of(path)](path, columns, source)
+
+def export(chunks, path: str, fmt: str = None, columns=None) -> int:
+    """Write an iterable of DataFrames (or a single one) to `path`; returns rows written."""
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    with open_writer(path, fmt, columns) as out:
+        for df in chunks:
+            out.write(df)
+    return out.rows
@@ -1,7 +1,14 @@
-import re, sys
+import os, re, sys, time
+import bisect, hashlib, importlib.util, inspect
+import unicodedata
 import warnings
+from contextlib import contextmanager
+from itertools import islice
+import numpy as np
 import pandas as pd
-import camelot, pdfplumber
+import pdfplumber
+
+from metrics import Metrics, instrumented
 
 # suppress cryptography deprecation warnings
 try:
@@ -10,388 +17,1388 @@ try:
 except ImportError:
     pass
 
-# ─── shared helper ────────────────────────────────────────────
+# ─── transaction schema ───────────────────────────────────────
+
+# Every layout yields these columns: dates as datetime64, amounts as
+# nullable Int64 cents (NA where a printed amount could not be read, and
+# in Saldo Liq., which only BBVA prints), the description as a
+# categorical. Columns a layout lacks stay empty. Fecha Texto keeps the
+# printed date of rows whose Fecha could not be parsed, so no date is lost.
+COLUMNS        = ("Fecha", "Fecha Liq.", "No. Ref.", "Descripción",
+                  "Depósitos", "Retiros", "Saldo", "Saldo Liq.", "Fecha Texto")
+AMOUNT_COLUMNS = ("Depósitos", "Retiros", "Saldo", "Saldo Liq.")
+DATE_COLUMNS   = ("Fecha", "Fecha Liq.")
+DTYPES         = {"Fecha": "datetime64[ns]", "Fecha Liq.": "datetime64[ns]",
+                  "No. Ref.": object, "Descripción": "category",
+                  "Depósitos": "Int64", "Retiros": "Int64", "Saldo": "Int64",
+                  "Saldo Liq.": "Int64", "Fecha Texto": object}
+
+MONTHS = {"ENE": 1, "FEB": 2, "MAR": 3, "ABR": 4, "MAY": 5, "JUN": 6,
+          "JUL": 7, "AGO": 8, "SEP": 9, "SET": 9, "OCT": 10, "NOV": 11, "DIC": 12}
+_MON = "|".join(MONTHS)
+
+# '05-ENE-23', '05/ENE', '5 ENE', '05 ENERO 2023'; 2-digit years need - or /
+DATE_PARTS_RE = re.compile(r"^\s*(?P<d>\d{1,2})[-/\s]+(?P<m>" + _MON + r")[A-Z]*\.?"
+                           r"(?:[-/](?P<y2>\d{2})\b|[-/\s]+(?P<y4>\d{4})\b)?")
+# dates with a year in the statement text: '31/01/2023', '31 ENE 2023', 'ENERO DE 2023'
+NUMERIC_DATE_RE = re.compile(r"\b\d{1,2}[/-](\d{1,2})[/-](\d{4})\b")
+NAMED_DATE_RE   = re.compile(r"\b(" + _MON + r")[A-Z]*\.?(?:\s+DE)?[\s/-]+(\d{4})\b")
+ACCOUNT_RE      = re.compile(r"\bCUENTA[^\d\n]{0,12}?(?=[\d-]{7})(\d{4,}(?:-\d+)*)")
+CLABE_RE        = re.compile(r"\bCLABE[^\d\n]{0,20}?(\d{18})\b")
+PDF_DATE_RE     = re.compile(r"^(?:D:)?(\d{4})(\d{2})")    # 'D:20230201120000-06'00''
 
-def parse_amount(s: str) -> float:
+def parse_amounts(values) -> pd.Series:
     """
-    Normalize '1,234.56' or '(1,234.56)' → 1234.56; else 0.0.
+    Parse a whole column of amounts ('1,234.56', '(1,234.56)',
+    '1,234.56-', '$ -5.00') into floats: everything but digits, '.', '-'
+    and '(' is dropped, '(' and a trailing '-' become a leading '-'.
+    Cells without a digit or letter ('', '$', '-') are 0.0; any other
+    cell that does not parse is NaN rather than a silent 0.
     """
-    if not isinstance(s, str) or not s.strip():
-        return 0.0
-    clean = (s.replace('$','')
-               .replace(',','')
-               .replace('(','-')
-               .replace(')','')
-               .strip())
-    try:
-        return float(clean)
-    except ValueError:
-        return 0.0
-
-# ─── 1) banorte0 ──────────────────────────────────────────────
-
-def banorte0(pdf_path: str) -> pd.DataFrame:
-    # (same implementation you already have)
-    DATE_RE = re.compile(r"^\d{2}-[A-Z]{3}-\d{2}$")
-    recs = []
-    tables = camelot.read_pdf(pdf_path, pages="all", flavor="stream", strip_text="\n")
-    for table in tables:
-        df = table.df
-        df = df[~df.iloc[:,0].str.upper().str.startswith("FECHA")]
-        for row in df.itertuples(index=False):
-            cols = list(row)
-            raw0 = str(cols[0])
-            fecha = raw0[:9]
-            if not DATE_RE.match(fecha):
-                continue
-            tail   = raw0[9:].strip()
-            middle = [str(c).strip() for c in cols[1:-3] if str(c).strip()]
-            descr  = " ".join([tail] + middle).strip()
-            dep    = parse_amount(cols[-3])
-            ret    = parse_amount(cols[-2])
-            sal    = parse_amount(cols[-1])
-            recs.append({
-                "Fecha":       fecha,
-                "Descripción": descr,
-                "Depósitos":   dep,
-                "Retiros":     ret,
-                "Saldo":       sal
-            })
-    return pd.DataFrame(recs)
-
-# ─── 2) citibanamex0 ──────────────────────────────────────────
-
-def citibanamex0(pdf_path: str) -> pd.DataFrame:
-    # (same implementation you already have)
-    KEYS    = {"FECHA","CONCEPTO","RETIROS","DEPOSITOS","SALDO"}
-    NUM_RE  = re.compile(r"[^\d\.]")
-    DATE_RE = re.compile(r"^\d{2}[-/\s][A-Z]{3}")
-
-    recs = []
-    tables = camelot.read_pdf(pdf_path, pages="all",
-                              flavor="stream", strip_text="\n", split_text=True)
-    for table in tables:
-        df = table.df.copy()
-        header_row = None
-        for i,row in df.iterrows():
-            up = [str(c).upper().strip() for c in row]
-            if KEYS.issubset(up):
-                header_row, hdr = i, up
-                break
-        if header_row is None:
-            continue
+    s     = pd.Series(values, dtype=object)
+    blank = ~s.str.contains(r"[^\W_]", regex=True).fillna(False).astype(bool)
+    s = (s.str.replace(r"[^\d.\-(]", "", regex=True).str.replace("(", "-", regex=False)
+          .str.replace(r"^([^-].*)-$", r"-\1", regex=True))
+    return pd.to_numeric(s, errors="coerce").mask(blank, 0.0).astype(float)
 
-        idx_f, idx_c = hdr.index("FECHA"), hdr.index("CONCEPTO")
-        idx_r, idx_d = hdr.index("RETIROS"), hdr.index("DEPOSITOS")
-        idx_s        = hdr.index("SALDO")
+def parse_dates(values, year: int = None, month: int = None) -> pd.Series:
+    """
+    Vectorized parse of Spanish statement dates into datetime64.
+    Dates printed without a year take `year`, or `year`-1 when their
+    month falls after `month` (a December row on a January statement).
+    Anything unparsable becomes NaT.
+    """
+    s     = pd.Series(values, dtype=object)
+    parts = s.str.upper().str.extract(DATE_PARTS_RE)
+    mon   = parts["m"].map(MONTHS)
+    yr    = pd.to_numeric(parts["y4"], errors="coerce").fillna(
+            pd.to_numeric(parts["y2"], errors="coerce") + 2000)
+    if year:
+        yr = yr.fillna(pd.Series(np.where(mon > (month or 12), year-1, year), index=s.index))
+    return pd.to_datetime(pd.DataFrame({"year": yr, "month": mon,
+                                        "day": pd.to_numeric(parts["d"])}),
+                          errors="coerce").astype("datetime64[ns]")
 
-        for _, r in df.iloc[header_row+1:].iterrows():
-            concepto = str(r[idx_c]).strip()
-            if not concepto:
-                continue
-            raw_fecha = str(r[idx_f]).strip()
-            fecha     = raw_fecha if DATE_RE.match(raw_fecha) else ""
-            def pn(x):
-                t = str(x or "").strip()
-                n = NUM_RE.sub("", t)
-                try:
-                    return float(n) if n else 0.0
-                except:
-                    return 0.0
-            recs.append({
-                "Fecha":       fecha,
-                "Descripción": concepto,
-                "Retiros":     pn(r[idx_r]),
-                "Depósitos":   pn(r[idx_d]),
-                "Saldo":       pn(r[idx_s])
-            })
-    return pd.DataFrame(recs)
-
-# ─── 3) banorte1 ──────────────────────────────────────────────
-
-def banorte1(pdf_path: str) -> pd.DataFrame:
-    # (same implementation you already have)
-    DATE_RE = re.compile(r"^\d{2}-[A-Z]{3}-\d{2}$")
-    recs    = []
-    tables  = camelot.read_pdf(pdf_path, pages="all",
-                               flavor="stream", strip_text="\n")
-    for table in tables:
-        df  = table.df.copy()
-        hrs = df.index[df.iloc[:,0].str.upper().str.startswith("FECHA")]
-        if hrs.empty:
-            continue
-        hr     = hrs[0]
-        header = [c.strip() for c in df.iloc[hr].tolist()]
+def parse_cents(values) -> pd.Series:
+    """parse_amounts as exact Int64 cents (NA where unparsable)."""
+    return np.rint(parse_amounts(values) * 100).astype("Int64")
 
-        try:
-            di = header.index("FECHA")
-        except ValueError:
-            di = 0
-        depo_i = next((i for i,h in enumerate(header)
-                       if "DEPÓSITO" in h.upper() or "DEPOSITO" in h.upper()), -3)
-        ret_i  = next((i for i,h in enumerate(header)
-                       if "RETIRO" in h.upper()), -2)
-        sal_i  = next((i for i,h in enumerate(header)
-                       if h.upper()=="SALDO"), -1)
-
-        for row in df.iloc[hr+1:].itertuples(index=False):
-            cols = [str(c).strip() for c in row]
-            raw0 = cols[di]
-            fecha= raw0[:9] if DATE_RE.match(raw0[:9]) else None
-            if not fecha:
-                if recs and cols[di]:
-                    recs[-1]["Descripción"] += " " + cols[di]
-                continue
-            tail   = raw0[9:].strip()
-            middle = [c for c in cols[di+1:depo_i] if c]
-            descr  = " ".join(([tail] if tail else []) + middle)
-            dep = parse_amount(cols[depo_i])
-            ret = parse_amount(cols[ret_i])
-            sal = parse_amount(cols[sal_i])
-            recs.append({
-                "Fecha":       fecha,
-                "Descripción": descr,
-                "Depósitos":   dep,
-                "Retiros":     ret,
-                "Saldo":       sal
-            })
-    return pd.DataFrame(recs)
-
-# ─── 4) citibanamex1 ──────────────────────────────────────────
-
-def citibanamex1(pdf_path: str) -> pd.DataFrame:
-    # (same implementation you already have)
-    AMT_RE   = re.compile(r'(\d{1,3}(?:,\d{3})*\.\d{2})\s+(\d{1,3}(?:,\d{3})*\.\d{2})$')
-    DATE_RE  = re.compile(r'^\s*(\d{1,2}\s+[A-ZÁÉÍÓÚÜÑ]+)\s+(.*)', re.UNICODE)
-    DEP_KEYS = re.compile(r'\b(DEPÓSITO|DEPOSITO|ABONO|INGRESO|RECIBIDO)\b', re.IGNORECASE)
-
-    recs = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            lines = page.extract_text().splitlines()
-            for i,L in enumerate(lines):
-                if not L.upper().startswith("HORA"):
-                    continue
-                m = AMT_RE.search(L)
-                if not m:
-                    continue
-                amt_str, bal_str = m.groups()
-
-                # find preceding date+desc
-                fecha_txt, init_desc = None, ""
-                for k in range(i-1, -1, -1):
-                    m2 = DATE_RE.match(lines[k].strip())
-                    if m2:
-                        fecha_txt, init_desc = m2.groups()
-                        break
-                if not fecha_txt:
-                    continue
+class Rows:
+    """
+    Column buffers for transactions in the shared schema: extractors
+    add raw cell strings row by row, to_frame() parses whole columns.
+    """
+    __slots__ = ("cols",)
 
-                desc_parts = [init_desc] if init_desc else []
-                for j in range(k+1, i):
-                    t = lines[j].strip()
-                    if not t or re.match(r'^(SUC|CAJA|AUT|RASTREO|CITA)\b',
-                                         t, re.IGNORECASE):
-                        continue
-                    desc_parts.append(t)
-                full_desc = " ".join(desc_parts).strip()
+    def __init__(self):
+        self.cols = {c: [] for c in COLUMNS if c != "Fecha Texto"}   # derived in to_frame
+
+    def __len__(self) -> int:
+        return len(self.cols["Fecha"])
+
+    def add(self, fecha, desc, dep, ret, saldo, ref=None, fecha_liq=None, saldo_liq=None):
+        c = self.cols
+        c["Fecha"].append(fecha)
+        c["Fecha Liq."].append(fecha_liq)
+        c["No. Ref."].append(ref)
+        c["Descripción"].append(desc)
+        c["Depósitos"].append(dep)
+        c["Retiros"].append(ret)
+        c["Saldo"].append(saldo)
+        c["Saldo Liq."].append(saldo_liq)
+
+    def extend_description(self, text: str):
+        """Continue the last row's description."""
+        self.cols["Descripción"][-1] += text
+
+    def extend(self, other: "Rows"):
+        for c, values in other.cols.items():
+            self.cols[c].extend(values)
+
+    def pop_last(self) -> "Rows":
+        """Move the last row (if any) out into a buffer of its own."""
+        last = Rows()
+        if len(self):
+            for c, values in self.cols.items():
+                last.cols[c].append(values.pop())
+        return last
+
+    def to_frame(self, ctx: "ParseContext") -> pd.DataFrame:
+        c = self.cols
+        year, month = ctx.period_end() if len(self) else (None, None)
+        liq   = pd.Series(c["Saldo Liq."], dtype=object)
+        raw   = pd.Series(c["Fecha"], dtype=object)
+        fecha = parse_dates(raw, year, month)
+        lost  = fecha.isna() & raw.fillna("").astype(str).str.strip().ne("")
+        return typed(pd.DataFrame({
+            "Fecha":       fecha,
+            "Fecha Liq.":  parse_dates(c["Fecha Liq."], year, month),
+            "No. Ref.":    pd.Series(c["No. Ref."], dtype=object),
+            "Descripción": pd.Series(c["Descripción"], dtype=object),
+            "Depósitos":   parse_cents(c["Depósitos"]),
+            "Retiros":     parse_cents(c["Retiros"]),
+            "Saldo":       parse_cents(c["Saldo"]),
+            "Saldo Liq.":  parse_cents(liq).mask(liq.isna()),
+            "Fecha Texto": raw.where(lost, None),
+        }))
+
+def typed(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast schema columns to DTYPES (e.g. after a round trip through Parquet)."""
+    return df.astype({c: t for c, t in DTYPES.items() if c in df.columns})
+
+def concat_transactions(frames) -> pd.DataFrame:
+    """Concatenate transaction frames, keeping descriptions categorical."""
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return Rows().to_frame(None)
+    df = pd.concat(frames, ignore_index=True)
+    df["Descripción"] = df["Descripción"].astype(object)
+    return typed(df)
+
+def to_units(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of `df` with amounts in currency units instead of cents, for display and export."""
+    df = df.copy()
+    for col in df.columns.intersection(AMOUNT_COLUMNS):
+        df[col] = df[col].astype("float64") / 100
+    return df
+
+# ─── word-position tables ─────────────────────────────────────
+
+# How each layout's tables are read (Layout.engine, collected in
+# TABLE_ENGINES). "words" buckets pdfplumber words into the columns of
+# the layout's header row (HEADER_KEYWORDS), giving the same cell grid
+# Camelot stream does at a fraction of the cost; "camelot" runs Camelot
+# stream. BSE_TABLE_ENGINE overrides all layouts.
+TABLE_ENGINE  = os.environ.get("BSE_TABLE_ENGINE") or None
+HAVE_CAMELOT  = importlib.util.find_spec("camelot") is not None
+
+WORD_LINE_TOL = 3.0   # points: words whose tops differ by less share a line
+WORD_COL_GAP  = 0.6   # header words closer than this × their height share a column
+
+def table_engine(layout: str) -> str:
+    if layout not in TABLE_ENGINES:
+        return "camelot"
+    return TABLE_ENGINE or TABLE_ENGINES[layout]
+
+def _word_lines(words: list) -> list:
+    """Group pdfplumber words into lines, top to bottom and left to right."""
+    lines = []
+    for w in sorted(words, key=lambda w: w["top"]):
+        if lines and w["top"] - lines[-1][0]["top"] < WORD_LINE_TOL:
+            lines[-1].append(w)
+        else:
+            lines.append([w])
+    return [sorted(line, key=lambda w: w["x0"]) for line in lines]
+
+def _header_cuts(line: list, keywords: tuple):
+    """
+    x positions separating the columns of a header line, or None if the
+    line does not hold all `keywords`. Words closer than WORD_COL_GAP
+    form one column label ("NO. REF.", "LIQ DESCRIPCIÓN").
+    """
+    if not all(k in _fold(" ".join(w["text"] for w in line)) for k in keywords):
+        return None
+    spans = []
+    for w in line:
+        if spans and w["x0"] - spans[-1][1] < WORD_COL_GAP * (w["bottom"] - w["top"]):
+            spans[-1][1] = w["x1"]
+        else:
+            spans.append([w["x0"], w["x1"]])
+    return [(a[1] + b[0]) / 2 for a, b in zip(spans, spans[1:])]
+
+def _word_grid(lines: list, cuts: list) -> pd.DataFrame:
+    """One row per line, words bucketed by their centre into the columns."""
+    rows = []
+    for line in lines:
+        cells = [[] for _ in range(len(cuts) + 1)]
+        for w in line:
+            cells[bisect.bisect(cuts, (w["x0"] + w["x1"]) / 2)].append(w["text"])
+        rows.append([" ".join(c) for c in cells])
+    return pd.DataFrame(rows, dtype=object)
+
+# ─── parse context ────────────────────────────────────────────
+
+class Cancelled(Exception):
+    """Raised inside an extraction whose cancel event was set."""
+
+class ParseContext:
+    """
+    Per-document parse cache shared by every extractor.
+
+    Camelot stream tables (once with and once without split_text),
+    word-position tables and pdfplumber page text are each produced at
+    most once per document. `strip_text` is applied to the cached cells
+    afterwards, the same way Camelot applies it, so layouts with
+    different strip settings still share one parse.
+
+    `pages` restricts the context to a chunk of the document (see
+    extract_parallel). Text that continues a record from before the
+    chunk is collected in `carry` instead of being dropped.
+
+    `batch` limits how many pages one Camelot call parses (default:
+    all remaining pages); streaming uses small batches and `release`
+    so memory stays bounded by the pages in flight.
+
+    All parsing is booked as stages in `metrics`, attributed to the
+    extractor currently named in `extractor`.
+
+    `progress(page, pages, extractor)` is called as each page is
+    reached, and setting the `cancel` event (a threading.Event) makes
+    the next page raise Cancelled.
+    """
+
+    def __init__(self, pdf_path: str, pages: list = None, batch: int = None,
+                 metrics: Metrics = None, progress=None, cancel=None):
+        self.pdf_path  = pdf_path
+        self.batch     = batch
+        self.metrics   = metrics if metrics is not None else Metrics()
+        self.progress  = progress
+        self.cancel    = cancel
+        self.extractor = None
+        self.carry     = []
+        self._pdf     = None
+        self._pages   = list(pages) if pages is not None else None
+        self._texts   = {}
+        self._tables  = {}
+        self._columns = {}
+        self._wanted  = {}
+        self._layouts = {}
+        self._period  = None
+        self._account = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
-                amt = parse_amount(amt_str)
-                if DEP_KEYS.search(full_desc):
-                    depo, ret = amt, 0.0
+    def stage(self, name: str, page=None):
+        """Time a block as stage `name` of the current extractor."""
+        return self.metrics.stage(name, self.extractor, page)
+
+    def close(self):
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+
+    @property
+    def pdf(self):
+        if self._pdf is None:
+            with self.stage("open"):
+                self._pdf = pdfplumber.open(self.pdf_path)
+        return self._pdf
+
+    @property
+    def pages(self) -> list:
+        """1-based page numbers covered by this context."""
+        if self._pages is None:
+            self._pages = list(range(1, len(self.pdf.pages)+1))
+        return self._pages
+
+    def wanted(self, p: int) -> bool:
+        """
+        Page prefilter: whether page `p` may hold transactions of the
+        current extractor (see page_layouts). Skipped pages are recorded
+        in metrics.
+        """
+        if not PREFILTER or self.extractor not in LAYOUTS:
+            return True
+        key = (self.extractor, p)
+        if key not in self._wanted:
+            self._wanted[key] = self.extractor in self.page_layouts(p)
+            if not self._wanted[key]:
+                self.metrics.skip_page(self.extractor, p)
+        return self._wanted[key]
+
+    def page_layouts(self, p: int) -> frozenset:
+        """
+        Layouts page `p` may hold transactions of, all tested in one
+        pass over its text and kept for every later extractor.
+        """
+        if p not in self._layouts:
+            with self.stage("prefilter", p):
+                self._layouts[p] = MATCHER.transaction_layouts(self.text(p))
+        return self._layouts[p]
+
+    def scan(self):
+        """The pages the current extractor should parse, in order."""
+        for i, p in enumerate(self.pages, 1):
+            self.checkpoint(i)
+            if self.wanted(p):
+                yield p
+
+    def checkpoint(self, done: int = None, total: int = None):
+        """Raise Cancelled if cancellation was requested, else report progress."""
+        if self.cancel is not None and self.cancel.is_set():
+            raise Cancelled(self.pdf_path)
+        if self.progress is not None and done is not None:
+            self.progress(done, total or len(self.pages), self.extractor)
+
+    def text(self, p: int) -> str:
+        """pdfplumber text of page `p` ('' for pages without a text layer)."""
+        if p not in self._texts:
+            with self.stage("text", p):
+                self._texts[p] = self.pdf.pages[p-1].extract_text() or ""
+        return self._texts[p]
+
+    def tables(self, p: int, split_text: bool = False, strip_text: str = "") -> list:
+        """
+        Tables of page `p`, as DataFrames, read with the current
+        extractor's table engine. Camelot is the fallback for word
+        tables that have no column layout to go on.
+        A Camelot miss parses page `p` and the following unparsed pages
+        (up to `batch`) in one call for that `split_text` setting; later
+        calls are served from the cache.
+        """
+        batch = self.batch
+        if table_engine(self.extractor) == "words":
+            dfs = self.word_tables(p)
+            if dfs is not None:
+                return dfs
+            if not HAVE_CAMELOT:
+                return []
+            batch = 1     # later pages may still get their columns from a header
+        found = self._tables.setdefault(split_text, {})
+        if p not in found:
+            todo = (q for q in self.pages if q >= p and q not in found and self.wanted(q))
+            todo = list(islice(todo, batch)) or [p]
+            for q in todo:
+                found[q] = []
+            span = todo[0] if len(todo) == 1 else f"{todo[0]}-{todo[-1]}"
+            with self.stage("camelot", span):
+                import camelot     # OpenCV & ghostscript: only load when tables are needed
+                tables = camelot.read_pdf(self.pdf_path, pages=",".join(map(str, todo)),
+                                          flavor="stream", split_text=split_text)
+                for t in tables:
+                    found.setdefault(int(t.page), []).append(t.df)
+        dfs = found[p]
+        if strip_text:
+            pat = "[" + "".join(map(re.escape, strip_text)) + "]"
+            dfs = [df.replace(pat, "", regex=True) for df in dfs]
+        return dfs
+
+    def word_tables(self, p: int):
+        """
+        Page `p` as one grid of pdfplumber words, with the columns of the
+        current extractor's header row: taken from this page, else from
+        the last page that printed it. None if no header was seen yet.
+        """
+        found = self._tables.setdefault(("words", self.extractor), {})
+        if p not in found:
+            with self.stage("words", p):
+                lines = _word_lines(self.pdf.pages[p-1].extract_words())
+                keys  = HEADER_KEYWORDS[self.extractor]
+                cuts  = next((c for c in map(lambda L: _header_cuts(L, keys), lines)
+                              if c is not None), None)
+                if cuts is not None:
+                    self._columns[self.extractor] = cuts
+                cuts = self._columns.get(self.extractor)
+                if cuts is None:
+                    return None
+                found[p] = [_word_grid(lines, cuts)] if lines else []
+        return found[p]
+
+    def lines(self, p: int) -> list:
+        """
+        Text lines of page `p` from whatever parse of it is cached:
+        pdfplumber text, else Camelot rows joined with spaces. Text is
+        only extracted when neither is cached.
+        """
+        if p not in self._texts:
+            for found in self._tables.values():
+                if p in found:
+                    return [" ".join(str(c).replace("\n", " ").strip()
+                                     for c in row if str(c).strip())
+                            for df in found[p] for row in df.itertuples(index=False)]
+        return self.text(p).splitlines()
+
+    def period_end(self) -> tuple:
+        """
+        (year, month) the statement period ends in, for dates printed
+        without a year: the latest dated mention on the first page, else
+        on the first later page that has one, else the PDF's creation
+        date, else today.
+        """
+        if self._period is None:
+            for p in range(1, len(self.pdf.pages)+1):
+                text  = _fold(self.text(p))
+                found = [(int(y), int(m)) for m, y in NUMERIC_DATE_RE.findall(text)]
+                found += [(int(y), MONTHS[m]) for m, y in NAMED_DATE_RE.findall(text)]
+                found = [(y, m) for y, m in found if 1990 <= y <= 2100 and 1 <= m <= 12]
+                if found:
+                    self._period = max(found)
+                    break
+            else:
+                meta = self.pdf.metadata or {}
+                m = PDF_DATE_RE.match(str(meta.get("CreationDate") or meta.get("ModDate") or ""))
+                if m and 1 <= int(m.group(2)) <= 12:
+                    self._period = int(m.group(1)), int(m.group(2))
                 else:
-                    depo, ret = 0.0, amt
-                sal = parse_amount(bal_str)
-
-                recs.append({
-                    "Fecha":       fecha_txt,
-                    "Descripción": full_desc,
-                    "Depósitos":   depo,
-                    "Retiros":     ret,
-                    "Saldo":       sal
-                })
-    return pd.DataFrame(recs)
-
-# ─── 5) banbajio ──────────────────────────────────────────────
-
-def banbajio(pdf_path: str) -> pd.DataFrame:
-    # (same implementation you already have)
-    def try_camelot(p):
-        rows   = []
-        tables = camelot.read_pdf(pdf_path, pages=str(p),
-                                  flavor="stream", strip_text="\n")
-        for table in tables:
-            df     = table.df
-            hdr_idx = None
-            hdr     = []
-            for i,row in df.iterrows():
-                up = [c.strip().upper() for c in row.tolist()]
-                if ("FECHA" in up and
-                    any("DESCRIPCION" in h for h in up) and
-                    "SALDO" in up):
-                    hdr_idx, hdr = i, up
+                    today = time.localtime()
+                    self._period = today.tm_year, today.tm_mon
+        return self._period
+
+    def account(self) -> str:
+        """
+        Account number printed on the first page ("No. de Cuenta ...",
+        else the CLABE), digits only, or "" if none is found.
+        """
+        if self._account is None:
+            text = _fold(self.text(1))
+            m = ACCOUNT_RE.search(text) or CLABE_RE.search(text)
+            self._account = m.group(1).replace("-", "") if m else ""
+        return self._account
+
+    def release(self, p: int):
+        """Forget everything cached for page `p`, pdfplumber's parsed objects included."""
+        self._texts.pop(p, None)
+        for found in self._tables.values():
+            found.pop(p, None)
+        if self._pdf is not None:
+            self._pdf.pages[p - 1].close()
+
+@contextmanager
+def _borrow(pdf_path: str, ctx: ParseContext = None):
+    """Use the caller's context, or open (and later close) a private one."""
+    if ctx is not None:
+        yield ctx
+        return
+    with ParseContext(pdf_path) as own:
+        yield own
+
+def _collect(stream, pdf_path: str, ctx: ParseContext = None) -> pd.DataFrame:
+    """Run a page stream to the end and build one DataFrame."""
+    direct = ctx is None
+    with _borrow(pdf_path, ctx) as ctx:
+        if direct:    # not via the dispatcher: name the layout after its stream
+            ctx.extractor = stream.__name__[len("_iter_"):]
+        recs = Rows()
+        for p, page in _timed(stream(ctx), ctx):
+            _count_page(ctx, p, len(page))
+            recs.extend(page)
+        with ctx.stage("dataframe"):
+            return recs.to_frame(ctx)
+
+def _timed(stream, ctx: ParseContext):
+    """Drive a page stream, booking each page's own work as stage "rows"."""
+    it = iter(stream)
+    while True:
+        with ctx.stage("rows") as tag:
+            try:
+                p, recs = next(it)
+            except StopIteration:
+                return
+            tag["page"] = p
+        yield p, recs
+
+def _count_page(ctx: ParseContext, p: int, found: int):
+    """
+    Book a page's rows against its candidate transaction lines, counted
+    with METRIC_PATTERNS on the text the extractor already parsed.
+    """
+    if ctx.extractor is None:
+        return
+    candidates = 0
+    if p not in ctx.metrics.coverage.get(ctx.extractor, {}):
+        pat = METRIC_PATTERNS[ctx.extractor]
+        candidates = sum(1 for L in ctx.lines(p) if pat.match(L))
+    ctx.metrics.count_page(ctx.extractor, p, candidates, found)
+
+# ─── layout specs ─────────────────────────────────────────────
+
+# A layout is data: the words of its header row, a pattern for its
+# candidate transaction lines, and rules saying where each field sits in
+# its tables or page text. One engine (_layout_stream) reads every
+# layout, and one LayoutMatcher tests all of them at once for detection
+# and the page prefilter. Onboarding a bank is adding a Layout to LAYOUTS.
+
+class _Spec:
+    """repr() lists every field, so it also versions the spec (layout_version)."""
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in vars(self).items())
+        return f"{type(self).__name__}({fields})"
+
+def _cell_test(how: str, word: str, cell: str) -> bool:
+    if how == "is":
+        return cell == word
+    if how == "has":
+        return word in cell
+    return cell.startswith(word)
+
+AMOUNT_ROLES = {"dep", "ret", "saldo", "saldo_liq"}
+UNSIGNED_RE  = re.compile(r"[-()]")
+
+class TableRules(_Spec):
+    """
+    How a layout reads transactions from table rows (cells stripped).
+
+      columns  role → position (negative counts from the right), or a
+               header test (how, word[, fallback]): ("is", W) the cell is
+               W, ("has", W) it contains W, ("first", W) it starts with W,
+               on cells upper-cased without accents. A fallback position
+               is used when no header cell passes; None makes the column
+               optional, no fallback makes it required. A header cell
+               goes to the first role it passes, a role to its first
+               cell. Roles: fecha, fecha_liq, ref, desc, dep, ret, saldo,
+               saldo_liq.
+      find     header row tests, (how, word), each holding for some cell
+               ("first" tests the first cell only). Default: the tests of
+               the required columns; none at all means every row of
+               every table is a data row.
+      skip     rows between the header and the data
+      key      role whose cell must be non-empty in a record
+      date     pattern a record's fecha must match; rows that fail are
+               dropped when `strict`, else kept without a date
+      date_width  the fecha cell holds the date in that many leading
+               characters, and the start of the description after them
+      span     the description is every non-empty cell between fecha and
+               dep (no desc column)
+      lead     role taking the first word of the description
+      follow   dateless rows continue the previous record's description,
+               across pages too: a page's last record is held back, and
+               text before the first record goes to ctx.carry
+      unsigned amounts print no sign: '-' and parentheses in them are
+               decoration and dropped
+      split_text, strip_text  Camelot options for the layout's tables
+    """
+
+    def __init__(self, columns: dict, find: tuple = None, skip: int = 0, key: str = None,
+                 date=None, date_width: int = 0, strict: bool = False, span: bool = False,
+                 lead: str = None, follow: bool = False, unsigned: bool = False,
+                 split_text: bool = False, strip_text: str = ""):
+        if find is None:
+            find = tuple(loc for loc in columns.values()
+                         if isinstance(loc, tuple) and len(loc) == 2)
+        self.columns    = columns
+        self.find       = find
+        self.skip       = skip
+        self.key        = key
+        self.date       = date
+        self.date_width = date_width
+        self.strict     = strict
+        self.span       = span
+        self.lead       = lead
+        self.follow     = follow
+        self.unsigned   = unsigned
+        self.split_text = split_text
+        self.strip_text = strip_text
+
+    def _is_header(self, cells: list) -> bool:
+        for how, word in self.find:
+            if how == "first":
+                if not (cells and cells[0].startswith(word)):
+                    return False
+            elif not any(_cell_test(how, word, c) for c in cells):
+                return False
+        return True
+
+    def _resolve(self, cells: list):
+        """role → column index for a header row, or None if a required column is missing."""
+        found = {}
+        for j, cell in enumerate(cells):
+            for role, loc in self.columns.items():
+                if isinstance(loc, tuple) and _cell_test(loc[0], loc[1], cell):
+                    found.setdefault(role, j)
                     break
-            if hdr_idx is None:
-                continue
-            mapping = {}
-            for j,h in enumerate(hdr):
-                if h=="FECHA":           mapping['f']=j
-                elif "REF" in h:         mapping['r']=j
-                elif "DESCRIPCION" in h: mapping['d']=j
-                elif "DEPOSITOS" in h:   mapping['p']=j
-                elif "RETIROS" in h:     mapping['t']=j
-                elif "SALDO" in h:       mapping['s']=j
-            if not {'f','d','p','t','s'}.issubset(mapping):
-                continue
-            for r in df.iloc[hdr_idx+2:].itertuples(index=False):
-                cols     = list(r)
-                fecha    = str(cols[mapping['f']]).strip()
-                raw_desc = str(cols[mapping['d']]).strip()
-                depo     = parse_amount(cols[mapping['p']])
-                ret      = parse_amount(cols[mapping['t']])
-                sal      = parse_amount(cols[mapping['s']])
-                rec      = {
-                    "Fecha":       fecha,
-                    "Descripción": raw_desc,
-                    "Depósitos":   depo,
-                    "Retiros":     ret,
-                    "Saldo":       sal
-                }
-                if 'r' in mapping:
-                    rec["No. Ref."] = str(cols[mapping['r']]).strip()
-                rows.append(rec)
-        return rows
-
-    def fallback_text(p):
-        rows = []
-        with pdfplumber.open(pdf_path) as pdf:
-            text = pdf.pages[p-1].extract_text() or ""
+        cols = {}
+        for role, loc in self.columns.items():
+            if not isinstance(loc, tuple):
+                cols[role] = loc
+            elif role in found:
+                cols[role] = found[role]
+            elif len(loc) == 2:
+                return None
+            elif loc[2] is not None:
+                cols[role] = loc[2]
+        return cols
+
+    def locate(self, df: pd.DataFrame) -> tuple:
+        """(first data row, role → column) of a table, or (None, None)."""
+        if not self.find:
+            return self.skip, self._resolve([])
+        for i, row in enumerate(df.itertuples(index=False)):
+            cells = [_fold(str(c).strip()) for c in row]
+            if self._is_header(cells):
+                cols = self._resolve(cells)
+                return (None, None) if cols is None else (i + 1 + self.skip, cols)
+        return None, None
+
+    def read(self, cells: list, cols: dict, recs: Rows, ctx: "ParseContext"):
+        """Add the record in one data row to `recs`, or continue the last one."""
+        raw   = cells[cols["fecha"]]
+        fecha = raw[:self.date_width] if self.date_width else raw
+        if self.date is not None and not self.date.match(fecha):
+            if self.strict:
+                if self.follow and raw:
+                    if recs:
+                        recs.extend_description(" " + raw)
+                    else:
+                        ctx.carry.append(raw)
+                return
+            fecha = ""
+        if self.key and not cells[cols[self.key]]:
+            return
+        if self.span:
+            rest = raw[self.date_width:].strip() if self.date_width else ""
+            desc = " ".join(([rest] if rest else []) +
+                            [c for c in cells[cols["fecha"]+1:cols["dep"]] if c])
+        else:
+            desc = cells[cols["desc"]]
+        fields = {role: cells[j] for role, j in cols.items()}
+        fields.update(fecha=fecha, desc=desc)
+        if self.lead:
+            head = desc.split(None, 1)
+            fields[self.lead] = head[0] if head else ""
+            fields["desc"]    = head[1] if len(head) > 1 else ""
+        if self.unsigned:
+            for role in AMOUNT_ROLES.intersection(fields):
+                fields[role] = UNSIGNED_RE.sub("", fields[role])
+        recs.add(**fields)
+
+class LedgerText(_Spec):
+    """
+    Transactions printed over several text lines. A line matching `open`
+    (date, description) opens a record; the lines after it, except
+    `skip` ones, add to its description until the next date line. Each
+    line starting with `emit` that ends in amount and balance (`amounts`)
+    books a record: a deposit when the description matches `deposit`,
+    else a withdrawal.
+    """
+
+    def __init__(self, open, emit: str, amounts, skip, deposit):
+        self.open    = open
+        self.emit    = emit
+        self.amounts = amounts
+        self.skip    = skip
+        self.deposit = deposit
+
+    def read(self, text: str, recs: Rows):
+        fecha, parts = None, []
+        for L in text.splitlines():
+            t = L.strip()
+            if fecha and L[:len(self.emit)].upper() == self.emit:
+                m = self.amounts.search(L)
+                if m:
+                    amount, balance = m.groups()
+                    desc = " ".join(parts).strip()
+                    dep, ret = (amount, "") if self.deposit.search(desc) else ("", amount)
+                    recs.add(fecha=fecha, desc=desc, dep=dep, ret=ret, saldo=balance)
+            m = self.open.match(t)
+            if m:
+                fecha, desc = m.groups()
+                parts = [desc] if desc else []
+            elif fecha and t and not self.skip.match(t):
+                parts.append(t)
+
+class ColumnText(_Spec):
+    """
+    Transactions printed one per text line. Stripped lines matching
+    `line` are cut at `split` into at least `min_cells` cells: the
+    first ones are the roles in `cells`, the last two amount and
+    balance. The amount is a withdrawal when it holds one of the
+    `withdrawal` characters, else a deposit. A cell that does not match
+    its pattern in `checks` is left out.
+    """
+
+    def __init__(self, line, split, min_cells: int, cells: tuple, withdrawal: str,
+                 checks: dict = None):
+        self.line       = line
+        self.split      = split
+        self.min_cells  = min_cells
+        self.cells      = cells
+        self.withdrawal = withdrawal
+        self.checks     = checks or {}
+
+    def read(self, text: str, recs: Rows):
         for line in text.splitlines():
-            line=line.strip()
-            if not re.match(r'^\d{1,2}\s+[A-ZÁÉÍÓÚÜÑ]+', line):
+            line = line.strip()
+            if not self.line.match(line):
                 continue
-            parts      = re.split(r'\s{2,}', line)
-            if len(parts)<5:
+            parts = self.split.split(line)
+            if len(parts) < self.min_cells:
                 continue
-            f, ref, desc = parts[0], parts[1], parts[2]
-            amt_str, bal_str = parts[-2], parts[-1]
-            amt        = parse_amount(amt_str)
-            depo, ret  = (amt,0.0) if "-" not in amt_str and "(" not in amt_str else (0.0,amt)
-            sl         = parse_amount(bal_str)
-            rec        = {
-                "Fecha":       f,
-                "Descripción": desc,
-                "Depósitos":   depo,
-                "Retiros":     ret,
-                "Saldo":       sl
-            }
-            if ref.isdigit():
-                rec["No. Ref."] = ref
-            rows.append(rec)
-        return rows
-
-    recs = []
-    with pdfplumber.open(pdf_path) as pdf:
-        total = len(pdf.pages)
-    for p in range(1, total+1):
-        block = try_camelot(p)
-        if not block:
-            block = fallback_text(p)
-        recs.extend(block)
-    return pd.DataFrame(recs)
-
-# ─── 6) bbva ─────────────────────────────────────────────────
-
-def bbva(pdf_path: str) -> pd.DataFrame:
-    # (same implementation you already have)
-    recs   = []
-    tables = camelot.read_pdf(pdf_path, pages="all", flavor="stream")
-    for tbl in tables:
-        df      = tbl.df
-        hdr_idx = None
-        for i,row in df.iterrows():
-            up = [c.strip().upper() for c in row.tolist()]
-            if ("OPER" in up and "CARGOS" in up and "ABONOS" in up):
-                hdr_idx = i
-                break
-        if hdr_idx is None:
+            fields = dict(zip(self.cells, parts))
+            for role, pat in self.checks.items():
+                if not pat.fullmatch(fields.get(role, "")):
+                    fields[role] = None
+            amount, fields["saldo"] = parts[-2], parts[-1]
+            if any(c in amount for c in self.withdrawal):
+                fields.update(dep="", ret=amount)
+            else:
+                fields.update(dep=amount, ret="")
+            recs.add(**fields)
+
+class Layout(_Spec):
+    """
+    One statement layout.
+
+      name     the extractor's name
+      header   words of its header row, accents stripped: detection, the
+               page prefilter and the columns of word tables. Only words
+               every statement prints: not those of optional columns
+      line     pattern of a candidate transaction line (a date and an
+               amount): detection, the prefilter and coverage
+      table    TableRules, if transactions are read from tables
+      text     LedgerText or ColumnText, if they are read from page
+               text; with a table, only on pages it found nothing on
+      engine   how its tables are read (see TABLE_ENGINES)
+    """
+
+    def __init__(self, name: str, header: tuple, line, table: TableRules = None,
+                 text=None, engine: str = "words"):
+        self.name   = name
+        self.header = header
+        self.line   = line
+        self.table  = table
+        self.text   = text
+        self.engine = engine
+
+def _read_tables(rules: TableRules, ctx: "ParseContext", p: int, recs: Rows):
+    for df in ctx.tables(p, split_text=rules.split_text, strip_text=rules.strip_text):
+        with ctx.stage("header", p):
+            start, cols = rules.locate(df)
+        if cols is None:
             continue
-        for r in df.iloc[hdr_idx+1:].itertuples(index=False):
-            oper = str(r[0]).strip()
-            if not oper:
-                continue
-            parts  = str(r[1]).split(None,1)
-            liq    = parts[0]
-            desc   = parts[1] if len(parts)>1 else ""
-            c      = parse_amount(r[2])
-            a      = parse_amount(r[3])
-            o      = parse_amount(r[4])
-            l      = parse_amount(r[5])
-            recs.append({
-                "OPER":        oper,
-                "LIQ":         liq,
-                "DESCRIPCIÓN": desc,
-                "CARGOS":      c,
-                "ABONOS":      a,
-                "OPERACIÓN":   o,
-                "LIQUIDACIÓN": l
-            })
-    return pd.DataFrame(recs)
+        for row in df.iloc[start:].itertuples(index=False):
+            rules.read([str(c).strip() for c in row], cols, recs, ctx)
+
+def _layout_stream(spec: Layout):
+    """The page stream (see _collect) reading `spec`'s transactions."""
+    follow = spec.table is not None and spec.table.follow
+
+    def stream(ctx: ParseContext):
+        held = Rows()
+        for p in ctx.scan():
+            recs, before = held, len(held)
+            if spec.table is not None:
+                _read_tables(spec.table, ctx, p, recs)
+            if spec.text is not None and len(recs) == before:
+                spec.text.read(ctx.text(p), recs)
+            held = recs.pop_last() if follow else Rows()
+            yield p, recs
+        if held:
+            yield p, held
+
+    stream.__name__ = stream.__qualname__ = "_iter_" + spec.name
+    return stream
+
+def _layout_extractor(stream):
+    def extract(pdf_path: str, ctx: ParseContext = None) -> pd.DataFrame:
+        return _collect(stream, pdf_path, ctx)
+    extract.__name__ = extract.__qualname__ = stream.__name__[len("_iter_"):]
+    return extract
+
+class LayoutMatcher:
+    """
+    Every layout's line pattern and header words, compiled to be tested
+    together. The line patterns are joined into one regex of optional
+    lookaheads, a named group per distinct pattern, so one match() per
+    line tells every layout it is a candidate for; header words are
+    folded once per text. Detection cost stays one pass over the lines
+    however many layouts are registered.
+    """
+
+    def __init__(self, layouts):
+        self.layouts = {spec.name: spec for spec in layouts}
+        self.group   = {}
+        groups, parts = {}, []
+        for spec in self.layouts.values():
+            flags = "".join(f for f, bit in (("i", re.I), ("m", re.M), ("s", re.S))
+                            if spec.line.flags & bit)
+            body  = f"(?{flags}:{spec.line.pattern})" if flags else spec.line.pattern
+            if body not in groups:
+                groups[body] = f"l{len(groups)}"
+                parts.append(f"(?:(?=(?P<{groups[body]}>{body})))?")
+            self.group[spec.name] = groups[body]
+        self.regex = re.compile("".join(parts))
+
+    def hits(self, lines) -> dict:
+        """layout → number of its candidate transaction lines in `lines`."""
+        counts = dict.fromkeys(self.group.values(), 0)
+        for L in lines:
+            for g, v in self.regex.match(L).groupdict().items():
+                if v is not None:
+                    counts[g] += 1
+        return {name: counts[g] for name, g in self.group.items()}
+
+    @staticmethod
+    def words(text: str) -> set:
+        return set(re.findall(r"[A-Z]+", _fold(text)))
+
+    def header_share(self, name: str, words: set) -> float:
+        keys = self.layouts[name].header
+        return sum(k in words for k in keys) / len(keys)
+
+    def transaction_layouts(self, text: str) -> frozenset:
+        """
+        Layouts page text may hold transactions of: it has one of their
+        candidate lines, or their full header row.
+        """
+        hits  = self.hits(text.splitlines())
+        found = {name for name, n in hits.items() if n}
+        if len(found) < len(self.layouts):
+            words  = self.words(text)
+            found |= {name for name in self.layouts
+                      if name not in found and self.header_share(name, words) == 1}
+        return frozenset(found)
+
+# ─── layouts ─────────────────────────────────────────────────
+
+LAYOUTS = {spec.name: spec for spec in (
+    Layout("banorte0",
+           header=("FECHA", "DESCRIPCION", "DEPOSITOS", "RETIROS", "SALDO"),
+           line=re.compile(r"^\d{2}-[A-Z]{3}-\d{2}\b.*\d[\d,]+\.\d{2}"),
+           table=TableRules(columns={"fecha": 0, "dep": -3, "ret": -2, "saldo": -1},
+                            date=re.compile(r"^\d{2}-[A-Z]{3}-\d{2}$"), date_width=9,
+                            strict=True, span=True, strip_text="\n")),
+    Layout("citibanamex0",
+           header=("FECHA", "CONCEPTO", "RETIROS", "DEPOSITOS", "SALDO"),
+           line=re.compile(r"^\d{2}[-/\s][A-Z]{3}\b.*\d[\d,]+\.\d{2}"),
+           table=TableRules(columns={"fecha": ("is", "FECHA"), "desc": ("is", "CONCEPTO"),
+                                     "ret": ("is", "RETIROS"), "dep": ("is", "DEPOSITOS"),
+                                     "saldo": ("is", "SALDO")},
+                            key="desc", date=re.compile(r"^\d{2}[-/\s][A-Z]{3}"),
+                            unsigned=True, split_text=True, strip_text="\n")),
+    Layout("banorte1",
+           header=("FECHA", "DESCRIPCION", "DEPOSITOS", "RETIROS", "SALDO"),
+           line=re.compile(r"^\d{2}-[A-Z]{3}-\d{2}\b.*\d[\d,]+\.\d{2}"),
+           table=TableRules(columns={"fecha": ("is", "FECHA", 0), "dep": ("has", "DEPOSITO", -3),
+                                     "ret": ("has", "RETIRO", -2), "saldo": ("is", "SALDO", -1)},
+                            find=(("first", "FECHA"),),
+                            date=re.compile(r"^\d{2}-[A-Z]{3}-\d{2}$"), date_width=9,
+                            strict=True, span=True, follow=True, strip_text="\n")),
+    # amounts sit on the HORA line below the date line
+    Layout("citibanamex1",
+           header=("HORA", "SUC", "AUT"),
+           line=re.compile(r"^\s*HORA\b.*\d[\d,]+\.\d{2}"),
+           text=LedgerText(open=re.compile(r"^\s*(\d{1,2}\s+[A-ZÁÉÍÓÚÜÑ]+)\s+(.*)"),
+                           emit="HORA",
+                           amounts=re.compile(r"(\d{1,3}(?:,\d{3})*\.\d{2})\s+"
+                                              r"(\d{1,3}(?:,\d{3})*\.\d{2})$"),
+                           skip=re.compile(r"^(SUC|CAJA|AUT|RASTREO|CITA)\b", re.I),
+                           deposit=re.compile(r"\b(DEPÓSITO|DEPOSITO|ABONO|INGRESO|RECIBIDO)\b",
+                                              re.I))),
+    Layout("banbajio",
+           header=("FECHA", "DESCRIPCION", "DEPOSITOS", "RETIROS", "SALDO"),
+           line=re.compile(r"^\s*\d{1,2}\s+[A-ZÁÉÍÓÚÜÑ]+\b.*\d[\d,]+\.\d{2}"),
+           table=TableRules(columns={"fecha": ("is", "FECHA"), "ref": ("has", "REF", None),
+                                     "desc": ("has", "DESCRIPCION"), "dep": ("has", "DEPOSITOS"),
+                                     "ret": ("has", "RETIROS"), "saldo": ("has", "SALDO")},
+                            find=(("is", "FECHA"), ("has", "DESCRIPCION"), ("is", "SALDO")),
+                            skip=1, strip_text="\n"),
+           text=ColumnText(line=re.compile(r"^\d{1,2}\s+[A-ZÁÉÍÓÚÜÑ]+"),
+                           split=re.compile(r"\s{2,}"), min_cells=5,
+                           cells=("fecha", "ref", "desc"), withdrawal="-(",
+                           checks={"ref": re.compile(r"\d+")})),
+    # OPER/LIQ dates, CARGOS withdrawals, ABONOS deposits,
+    # OPERACIÓN/LIQUIDACIÓN balances
+    Layout("bbva",
+           header=("OPER", "LIQ", "CARGOS", "ABONOS", "OPERACION", "LIQUIDACION"),
+           line=re.compile(r"^\s*\d{2}/[A-Z]{3}\b.*\d[\d,]+\.\d{2}"),
+           table=TableRules(columns={"fecha": 0, "desc": 1, "ret": 2, "dep": 3, "saldo": 4,
+                                     "saldo_liq": 5},
+                            find=(("is", "OPER"), ("is", "CARGOS"), ("is", "ABONOS")),
+                            key="fecha", lead="fecha_liq")),
+)}
+
+MATCHER = LayoutMatcher(LAYOUTS.values())
 
 # ─── dispatcher & metrics ────────────────────────────────────
 
-EXTRACTORS = [
-    ("banorte0",     banorte0),
-    ("citibanamex0", citibanamex0),
-    ("banorte1",     banorte1),
-    ("citibanamex1", citibanamex1),
-    ("banbajio",     banbajio),
-    ("bbva",         bbva),
-]
+# page-by-page record generators behind each extractor
+STREAMS    = {name: _layout_stream(spec) for name, spec in LAYOUTS.items()}
+EXTRACTORS = [(name, _layout_extractor(stream)) for name, stream in STREAMS.items()]
+banorte0, citibanamex0, banorte1, citibanamex1, banbajio, bbva = (fn for _, fn in EXTRACTORS)
 
 # only count lines that *start* with the date *and* contain an amount
-METRIC_PATTERNS = {
-    "banorte0":     re.compile(r"^\d{2}-[A-Z]{3}-\d{2}\b.*\d[\d,]+\.\d{2}"),
-    "citibanamex0": re.compile(r"^\d{2}[-/\s][A-Z]{3}\b.*\d[\d,]+\.\d{2}"),
-    "banorte1":     re.compile(r"^\d{2}-[A-Z]{3}-\d{2}\b.*\d[\d,]+\.\d{2}"),
-    "citibanamex1": re.compile(r"^\s*\d{1,2}\s+[A-ZÁÉÍÓÚÜÑ]+\b.*\d[\d,]+\.\d{2}"),
-    "banbajio":     re.compile(r"^\s*\d{1,2}\s+[A-ZÁÉÍÓÚÜÑ]+\b.*\d[\d,]+\.\d{2}"),
-    "bbva":         re.compile(r"^\s*\d{1,2}\s+[A-ZÁÉÍÓÚÜÑ]+\b.*\d[\d,]+\.\d{2}"),
-}
+METRIC_PATTERNS = {name: spec.line for name, spec in LAYOUTS.items()}
+
+# ─── layout fingerprint ──────────────────────────────────────
+
+# header words each layout prints above its transactions (accents stripped)
+HEADER_KEYWORDS = {name: spec.header for name, spec in LAYOUTS.items()}
+TABLE_ENGINES   = {name: spec.engine for name, spec in LAYOUTS.items() if spec.table}
+
+FINGERPRINT_PAGES = 2     # pages of text read to pick a layout
+FINGERPRINT_MIN   = 0.6   # below this, fall back to the ordered sweep
+FINGERPRINT_LINES = 5     # candidate lines that count as a full date score
+
+def _fold(text: str) -> str:
+    """Upper-case and strip accents, so DEPÓSITOS matches DEPOSITOS."""
+    text = unicodedata.normalize("NFKD", text.upper())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+def fingerprint(ctx: ParseContext, max_pages: int = FINGERPRINT_PAGES):
+    """
+    Score every layout from the text of the first `max_pages` pages, all
+    layouts in one pass (MATCHER). Half of the score is the share of
+    header keywords present, half the number of candidate transaction
+    lines. Returns (best layout, best score, {layout: score}).
+    """
+    with ctx.stage("fingerprint"):
+        lines = []
+        for p in ctx.pages[:max_pages]:
+            lines.extend(ctx.text(p).splitlines())
+        words = MATCHER.words("\n".join(lines))
+        hits  = MATCHER.hits(lines)
+
+        scores = {}
+        for name, _ in EXTRACTORS:
+            hdr = MATCHER.header_share(name, words)
+            scores[name] = round(0.5*hdr + 0.5*min(hits[name], FINGERPRINT_LINES)/FINGERPRINT_LINES, 3)
+    best = max(scores, key=scores.get)      # ties keep EXTRACTORS order
+    return best, scores[best], scores
+
+PREFILTER = os.environ.get("BSE_PREFILTER", "1") not in ("", "0")
+
+def _ranked(ctx: ParseContext) -> list:
+    """
+    Extractors in the order to try them; the fingerprint (and the
+    account number) goes into ctx.metrics. Confident layouts go first, best score first; the
+    rest keep the EXTRACTORS order as a fallback sweep.
+    """
+    best, score, scores = fingerprint(ctx)
+    ctx.metrics.info.update(fingerprint=best, score=score, scores=scores,
+                            account=ctx.account())
+    if score < FINGERPRINT_MIN:
+        return list(EXTRACTORS)
+    order = sorted(EXTRACTORS, key=lambda e: -scores[e[0]])
+    lead  = [e for e in order if scores[e[0]] >= FINGERPRINT_MIN]
+    return lead + [e for e in EXTRACTORS if e not in lead]
+
+PROBE_PAGES = 2      # transaction pages a candidate is judged on
+PROBE_MIN   = 0.5    # confidence below this abandons the candidate
+
+def _attempt(name: str, fn, pdf_path: str, ctx: ParseContext, probe: bool = True) -> pd.DataFrame:
+    """
+    Run one extractor on the shared context, booking its stages and
+    outcome (rows, confidence or error) in ctx.metrics. Errors are
+    logged with the extractor's name and give an empty frame.
+
+    With `probe`, the candidate is judged after its first PROBE_PAGES
+    transaction pages (see _confidence): below PROBE_MIN it is abandoned
+    there with an empty frame, otherwise the same pass runs on through
+    the rest of the document.
+    """
+    ctx.extractor = name
+    attempt = {"extractor": name, "rows": 0, "error": None}
+    t0 = time.perf_counter()
+    try:
+        if probe and name in STREAMS:
+            df = _probed(name, ctx, attempt)
+        else:
+            df = fn(pdf_path, ctx)
+        attempt["rows"] = len(df)
+        return df
+    except Cancelled:
+        attempt["error"] = "cancelled"
+        raise
+    except Exception as e:
+        attempt["error"] = f"{type(e).__name__}: {e}"
+        print(f"[extractors] {name} failed: {attempt['error']}", file=sys.stderr)
+        return pd.DataFrame()
+    finally:
+        attempt["seconds"] = round(time.perf_counter() - t0, 4)
+        ctx.metrics.attempts.append(attempt)
+        ctx.extractor = None
+
+def _probed(name: str, ctx: ParseContext, attempt: dict) -> pd.DataFrame:
+    """_collect for the dispatcher: one pass, with a verdict on the first pages."""
+    recs, probed, verdict = Rows(), [], None
+    for p, page in _timed(STREAMS[name](ctx), ctx):
+        _count_page(ctx, p, len(page))
+        recs.extend(page)
+        if verdict is None and (page or name in ctx.page_layouts(p)):
+            probed.append(p)
+            if len(probed) == PROBE_PAGES:
+                verdict = _confidence(name, ctx, recs, probed)
+                if verdict["score"] < PROBE_MIN:
+                    break
+    else:
+        if verdict is None:     # shorter than the probe: judge the whole document
+            verdict = _confidence(name, ctx, recs, probed)
+    attempt["confidence"] = verdict
+    if verdict["score"] < PROBE_MIN:
+        if probed:
+            attempt["abandoned"] = probed[-1]     # page it was dropped after
+        return pd.DataFrame()
+    with ctx.stage("dataframe"):
+        return recs.to_frame(ctx)
+
+def _confidence(name: str, ctx: ParseContext, recs: Rows, pages: list) -> dict:
+    """
+    Judge a candidate on the pages parsed so far, each signal in [0, 1]:
+    "header", the share of its header keywords printed on them; "rows",
+    rows found per candidate transaction line; "balance", the share of
+    consistent running balances. "score" is the mean of the signals
+    that could be measured, and 0 without any row.
+    """
+    with ctx.stage("probe"):
+        words   = MATCHER.words("\n".join(ctx.text(p) for p in pages))
+        signals = {"header": MATCHER.header_share(name, words)}
+        cov = ctx.metrics.coverage.get(name, {})
+        candidates = sum(cov[p][0] for p in pages if p in cov)
+        if candidates:
+            signals["rows"] = min(len(recs) / candidates, 1.0)
+        if len(recs) > 1:
+            checked, ok, _ = balance_check(recs.to_frame(ctx))
+            if checked:
+                signals["balance"] = ok / checked
+        score = sum(signals.values()) / len(signals) if len(recs) else 0.0
+    return {"pages": pages, **{k: round(v, 3) for k, v in signals.items()},
+            "score": round(score, 3)}
+
+BALANCE_TOLERANCE = 0     # cents
+
+def balance_check(df: pd.DataFrame) -> tuple:
+    """
+    Vectorized running-balance check: between two rows that print a
+    balance, the balance must move by the deposits minus withdrawals
+    booked since (rows without a balance, Saldo 0, are summed into the
+    next one; an unreadable amount counts as 0, so it shows as a break).
+    Returns (checked, consistent, indexes of breaking rows).
+    """
+    if len(df) < 2:
+        return 0, 0, []
+    dep, ret, bal = (df[c].fillna(0) for c in ("Depósitos", "Retiros", "Saldo"))
+    moved = (dep - ret).cumsum()[bal != 0]
+    bal   = bal[bal != 0]
+    diff  = (bal.diff() - moved.diff()).abs().iloc[1:]
+    bad   = diff > BALANCE_TOLERANCE
+    return len(diff), int((~bad).sum()), diff.index[bad].tolist()
+
+def _score(name: str, df: pd.DataFrame, metrics: Metrics) -> tuple:
+    """
+    (total, found, pct) for a result: total is the number of candidate
+    transaction lines counted while parsing, pct the share of them
+    extracted (NaN when none could be counted). The balance check
+    goes into metrics.
+    """
+    total = sum(c for _, c, _ in metrics.page_coverage(name))
+    found = len(df)
+    pct   = round(100.0 * found / total, 1) if total else float("nan")
+    checked, ok, breaks = balance_check(df)
+    metrics.info.update(candidates=total, balance_checked=checked,
+                        balance_ok=ok, balance_breaks=breaks[:20])
+    return total, found, pct
+
+class ExtractionResult(tuple):
+    """
+    The classic 5-tuple (layout, df, total, found, pct), so existing
+    unpacking keeps working, with a Metrics object attached.
+    """
+
+    def __new__(cls, layout, df, total, found, pct, metrics: Metrics = None):
+        self = super().__new__(cls, (layout, df, total, found, pct))
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.metrics["layout"] = layout
+        return self
+
+    def __getnewargs__(self):
+        return tuple(self)
+
+STREAM_BATCH = 1   # pages per Camelot call while streaming
+
+def iter_transactions(pdf_path: str, layout: str = None, metrics: Metrics = None,
+                      progress=None, cancel=None):
+    """
+    Yield the statement's transactions as one small DataFrame per page,
+    as soon as that page is parsed; each chunk's `attrs` holds its
+    "layout" and "page".
+
+    Without `layout`, candidates are tried in fingerprint order and the
+    first one to produce a record is committed to; errors after that
+    point propagate. Streamed pages are released from the parse cache,
+    so memory stays bounded on long documents. Stage timings go into
+    `metrics` when given; `progress` and `cancel` are as for ParseContext.
+    """
+    with ParseContext(pdf_path, batch=STREAM_BATCH, metrics=metrics,
+                      progress=progress, cancel=cancel) as ctx:
+        order = [(layout, None)] if layout else _ranked(ctx)
+        for name, _ in order:
+            ctx.extractor = name
+            stream = _timed(STREAMS[name](ctx), ctx)
+            try:
+                for p, recs in stream:
+                    _count_page(ctx, p, len(recs))
+                    if recs:
+                        break
+                else:
+                    continue
+            except Cancelled:
+                raise
+            except Exception:
+                if layout:
+                    raise
+                continue
+            yield _chunk(recs, name, p, ctx)
+            _release_through(ctx, p)
+            for p, recs in stream:
+                _count_page(ctx, p, len(recs))
+                if recs:
+                    yield _chunk(recs, name, p, ctx)
+                _release_through(ctx, p)
+            return
+
+def _chunk(recs: Rows, layout: str, page: int, ctx: ParseContext) -> pd.DataFrame:
+    with ctx.stage("dataframe", page):
+        df = recs.to_frame(ctx)
+    df.attrs.update(layout=layout, page=page)
+    return df
+
+def _release_through(ctx: ParseContext, p: int):
+    for q in ctx.pages:
+        if q > p:
+            break
+        ctx.release(q)
 
 def auto_extract(pdf_path: str) -> pd.DataFrame:
     """
-    Try each extractor in order; return the first non-empty DataFrame.
+    Try each extractor, fingerprinted layout first; return the first
+    non-empty DataFrame. All extractors share one ParseContext, so the
+    PDF is parsed once.
     """
-    for name, fn in EXTRACTORS:
-        try:
-            df = fn(pdf_path)
+    with ParseContext(pdf_path) as ctx:
+        for name, fn in _ranked(ctx):
+            df = _attempt(name, fn, pdf_path, ctx)
             if not df.empty:
                 print(f"[extractors] using '{name}'", file=sys.stderr)
                 return df
-        except Exception:
-            pass
     print("[extractors] no extractor matched", file=sys.stderr)
     return pd.DataFrame()
 
-def auto_extract_with_metrics(pdf_path: str):
+def auto_extract_with_metrics(pdf_path: str, workers: int = 1,
+                              chunk_pages: int = None, use_cache: bool = True,
+                              trace_path: str = None, progress=None, cancel=None):
     """
-    Try each extractor in order; return five values so existing unpacking still works:
+    Try each extractor, fingerprinted layout first; return an
+    ExtractionResult whose five values keep existing unpacking working:
       - layout name (str or None)
       - extracted DataFrame (pd.DataFrame)
-      - total (int) — here set equal to the number actually extracted
+      - total (int) — candidate transaction lines (METRIC_PATTERNS) on the parsed pages
       - found (int) — number of rows extracted
-      - pct (float) — extraction percentage (always 100.0 when any rows found)
+      - pct (float) — coverage, found / total in percent (NaN if total is 0)
+    `.metrics` is a Metrics object: the fingerprinted layout and its
+    score, every attempted extractor, per-page coverage, the running
+    balance check (balance_checked / balance_ok / balance_breaks), and
+    wall time (plus peak memory with BSE_TRACE_MEMORY=1) per stage,
+    extractor and page. It is also
+    written as JSON to `trace_path` (or into BSE_TRACE_DIR), and the
+    run is profiled with cProfile when BSE_PROFILE is set; see metrics.py.
+
+    With `workers` > 1, documents longer than one chunk are split into
+    page chunks: the layout is chosen on the first chunk, and the rest
+    run in worker processes (see extract_parallel).
+
+    Results are kept in the on-disk ResultCache (see cache.py), keyed
+    by file contents and layout code version; `use_cache=False`
+    bypasses it.
+
+    `progress(page, pages, extractor)` is called as pages are parsed;
+    setting the `cancel` event stops the extraction with Cancelled at
+    the next page (see ParseContext).
     """
-    for name, fn in EXTRACTORS:
+    with instrumented(pdf_path, trace_path) as run:
+        res = _cached_extract(pdf_path, workers, chunk_pages, use_cache, progress, cancel)
+        run["metrics"] = res.metrics
+        return res
+
+def _cached_extract(pdf_path: str, workers: int, chunk_pages: int, use_cache: bool,
+                    progress=None, cancel=None):
+    if not use_cache:
+        return _extract_with_metrics(pdf_path, workers, chunk_pages, progress, cancel)
+
+    from cache import ResultCache, file_digest
+    store = key = None
+    try:
         try:
-            df = fn(pdf_path)
+            store = ResultCache()
+            key   = file_digest(pdf_path), layout_versions()
+            hit   = store.get(*key)
+            if hit is not None:
+                name, df, meta = hit
+                metrics = Metrics.from_dict(meta["metrics"])
+                metrics["cached"] = True
+                return ExtractionResult(name, typed(df), meta["total"], meta["found"],
+                                        meta["pct"], metrics)
+        except Exception as e:      # a broken cache is a miss, never a failed extraction
+            print(f"[extractors] result cache unavailable: {e}", file=sys.stderr)
+        res = _extract_with_metrics(pdf_path, workers, chunk_pages, progress, cancel)
+        if key is not None:
+            digest, versions = key
+            name, df, total, found, pct = res
+            try:
+                store.put(digest, name, versions[name or ""], df,
+                          {"total": total, "found": found, "pct": pct,
+                           "metrics": res.metrics.to_dict()})
+            except Exception as e:
+                print(f"[extractors] could not cache result: {e}", file=sys.stderr)
+        return res
+    finally:
+        if store is not None:
+            store.close()
+
+def _extract_with_metrics(pdf_path: str, workers: int = 1, chunk_pages: int = None,
+                          progress=None, cancel=None):
+    chunk_pages = chunk_pages or PAGE_CHUNK
+    metrics     = Metrics()
+    if workers > 1:
+        with ParseContext(pdf_path, metrics=metrics) as ctx:
+            pages = ctx.pages
+        if len(pages) > chunk_pages:
+            # the head chunk reports progress against the whole document
+            head_progress = progress and (lambda done, _, name: progress(done, len(pages), name))
+            with ParseContext(pdf_path, pages[:chunk_pages], metrics=metrics,
+                              progress=head_progress, cancel=cancel) as head:
+                for name, fn in _ranked(head):
+                    first = _attempt(name, fn, pdf_path, head)
+                    if first.empty:
+                        continue
+                    df = extract_parallel(pdf_path, name, workers, chunk_pages,
+                                          pages=pages[chunk_pages:], head=first,
+                                          metrics=metrics, progress=progress, cancel=cancel)
+                    total, found, pct = _score(name, df, metrics)
+                    return ExtractionResult(name, df, total, found, pct, metrics)
+            # the first chunk matched nothing (cover pages?): sweep serially
+
+    with ParseContext(pdf_path, metrics=metrics, progress=progress, cancel=cancel) as ctx:
+        for name, fn in _ranked(ctx):
+            df = _attempt(name, fn, pdf_path, ctx)
             if not df.empty:
-                found = len(df)
-                # to satisfy the 5‐value unpack, we set total = found, pct = 100.0
-                return name, df, found, found, 100.0
-        except Exception:
-            continue
+                total, found, pct = _score(name, df, metrics)
+                return ExtractionResult(name, df, total, found, pct, metrics)
 
     # no extractor matched
-    return None, pd.DataFrame(), 0, 0, 0.0
\ No newline at end of file
+    return ExtractionResult(None, pd.DataFrame(), 0, 0, 0.0, metrics)
+
+# ─── page-parallel extraction ────────────────────────────────
+
+PAGE_CHUNK = 8    # pages per worker task
+
+def _extract_chunk(name: str, pdf_path: str, pages: list, period: tuple = None):
+    """Worker task: run one extractor over a page chunk."""
+    fn = dict(EXTRACTORS)[name]
+    with ParseContext(pdf_path, pages) as ctx:
+        ctx.extractor = name
+        ctx._period   = period    # saves re-reading page 1 in every worker
+        return fn(pdf_path, ctx), ctx.carry, ctx.metrics
+
+def _stitch(parts: list) -> pd.DataFrame:
+    """
+    Concatenate (df, carry) chunk results in page order. A chunk's
+    carry is text that continues the last record of the chunk before
+    it (banorte1's description lines), so it is appended there. Other
+    carry-overs never cross a page: citibanamex1 only searches back to
+    the top of the current page, and banbajio works page by page.
+    """
+    frames = []
+    for df, carry in parts:
+        prev = next((f for f in reversed(frames) if not f.empty), None)
+        if carry and prev is not None:
+            desc = prev["Descripción"].astype(object)
+            desc.iloc[-1] = " ".join([desc.iloc[-1]] + carry)
+            prev["Descripción"] = desc
+        frames.append(df.copy())
+    return concat_transactions(frames)
+
+def extract_parallel(pdf_path: str, name: str, workers: int = None,
+                     chunk_pages: int = PAGE_CHUNK, pages: list = None,
+                     head: pd.DataFrame = None, metrics: Metrics = None,
+                     progress=None, cancel=None) -> pd.DataFrame:
+    """
+    Run extractor `name` over `pages` (default: all) in chunks of
+    `chunk_pages`, spread over `workers` processes, and stitch the
+    records back together in page order. `head` is an already
+    extracted result for the pages just before `pages`. The workers'
+    stage timings are merged into `metrics` when given. Progress is
+    reported and `cancel` checked as each chunk comes back; on
+    cancellation, chunks not yet started are dropped.
+
+    Called off the main thread (the GUI runs extractions in a worker
+    thread next to Tk and its X connection), the workers are spawned
+    instead of forked: forking a process that runs other threads is unsafe.
+    """
+    import multiprocessing, threading
+    from concurrent.futures import ProcessPoolExecutor
+
+    spawn = threading.current_thread() is not threading.main_thread()
+    mp_context = multiprocessing.get_context("spawn") if spawn else None
+
+    with ParseContext(pdf_path, progress=progress, cancel=cancel) as ctx:
+        ctx.extractor = name
+        everything = ctx.pages
+        pages  = everything if pages is None else pages
+        period = ctx.period_end()
+        chunks = [pages[i:i+chunk_pages] for i in range(0, len(pages), chunk_pages)]
+        parts  = [(head, [])] if head is not None else []
+        done   = len(everything) - len(pages)
+        if chunks:
+            with ProcessPoolExecutor(max_workers=min(workers or 1, len(chunks)),
+                                     mp_context=mp_context) as pool:
+                try:
+                    for chunk, (df, carry, chunk_metrics) in zip(chunks, pool.map(
+                            _extract_chunk, [name]*len(chunks), [pdf_path]*len(chunks),
+                            chunks, [period]*len(chunks))):
+                        parts.append((df, carry))
+                        if metrics is not None:
+                            metrics.merge(chunk_metrics)
+                        done += len(chunk)
+                        ctx.checkpoint(done, len(everything))
+                except Cancelled:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+    return _stitch(parts)
+
+# ─── result cache versions ───────────────────────────────────
+
+ENGINE_VERSION = "8"   # bump when shared helpers change extractor output
+
+# code every layout's rows go through, from detection to stitching; its
+# source is part of each version
+ENGINE_CODE = (parse_amounts, parse_dates, parse_cents, Rows, typed, _fold,
+               _word_lines, _header_cuts, _word_grid, ParseContext, _collect,
+               _cell_test, TableRules, LedgerText, ColumnText, _read_tables, _layout_stream,
+               fingerprint, LayoutMatcher, _ranked, _probed, _confidence, _attempt,
+               _extract_with_metrics, _stitch, _extract_chunk, extract_parallel)
+
+def _engine_settings() -> str:
+    """Constants and environment settings that change which rows come out."""
+    return repr((FINGERPRINT_MIN, FINGERPRINT_PAGES, PROBE_MIN, PROBE_PAGES,
+                 TABLE_ENGINE, PREFILTER))
+
+_engine_hash = None
+
+def _engine_source() -> bytes:
+    """
+    Hash of ENGINE_CODE's source and of the engine settings
+    (ENGINE_VERSION stands in for code with no source).
+    """
+    global _engine_hash
+    if _engine_hash is None:
+        h = hashlib.sha1((ENGINE_VERSION + _engine_settings()).encode())
+        for obj in ENGINE_CODE:
+            try:
+                h.update(inspect.getsource(obj).encode("utf-8"))
+            except (OSError, TypeError):      # no source, e.g. a frozen build
+                pass
+        _engine_hash = h.digest()
+    return _engine_hash
+
+def layout_version(name: str) -> str:
+    """
+    Short hash of a layout's spec and of the engine code reading it,
+    used to invalidate cached results: editing either makes the
+    layout's cached rows stale.
+    """
+    spec = repr(LAYOUTS[name]).encode("utf-8")
+    return hashlib.sha1(_engine_source() + spec).hexdigest()[:12]
+
+def layout_versions() -> dict:
+    """
+    Version of every layout, plus "" (the no-match result), which is
+    stale as soon as any layout, the detection code or a setting changes.
+    """
+    versions = {name: layout_version(name) for name, _ in EXTRACTORS}
+    versions[""] = hashlib.sha1("".join(versions.values()).encode()).hexdigest()[:12]
+    return versions
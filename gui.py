@@ -1,18 +1,126 @@
 import os
+import queue
 import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
-from extractors import auto_extract_with_metrics
+# extractors (pandas, pdfplumber, camelot when installed) is imported on
+# first use, so the window opens before the heavy dependencies have loaded
+
+PREVIEW_PAGE = 200    # rows formatted and held in the preview at a time
+POLL_MS      = 50     # how often the Tk thread runs what worker threads posted
+
+def _warm_up():
+    """Import the extraction stack; safe to call from any thread."""
+    import extractors
+    if extractors.HAVE_CAMELOT:       # optional: only the fallback table engine needs it
+        import camelot
+    return extractors
+
+class PreviewTable(ttk.Frame):
+    """
+    A Treeview over a whole result DataFrame that only ever holds a
+    window of PREVIEW_PAGE formatted rows. The scrollbar spans the whole
+    frame; scrolling to either edge of the window, or dragging the
+    scrollbar past it, reloads the window around the new position.
+    """
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.df    = None
+        self.start = 0        # frame row of the window's first item
+        self.size  = 0        # items in the window
+        self.tree = ttk.Treeview(self, show="headings", selectmode="browse")
+        self.yscr = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._yview)
+        xscr      = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(yscrollcommand=self._scrolled, xscrollcommand=xscr.set)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.yscr.grid(row=0, column=1, sticky="ns")
+        xscr.grid(row=1, column=0, sticky="ew")
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+    def show(self, df):
+        """Replace the table's contents with `df` (None clears it)."""
+        self.tree.delete(*self.tree.get_children())
+        self.df, self.start, self.size = df, 0, 0
+        if df is None:
+            self.tree["columns"] = ()
+            return
+        from extractors import AMOUNT_COLUMNS
+        self.tree["columns"] = list(df.columns)
+        for c in df.columns:
+            amount = c in AMOUNT_COLUMNS
+            self.tree.heading(c, text=c)
+            self.tree.column(c, anchor=tk.E if amount else tk.W, stretch=c == "Descripción",
+                             width=260 if c == "Descripción" else 95)
+        self._load(0)
+
+    def _load(self, start: int):
+        """Refill the window with the rows from frame row `start` on."""
+        from extractors import AMOUNT_COLUMNS, DATE_COLUMNS, to_units
+        start = max(0, min(int(start), len(self.df) - PREVIEW_PAGE))
+        chunk = to_units(self.df.iloc[start:start + PREVIEW_PAGE])
+        cells = chunk.astype(object).where(chunk.notna(), "")
+        for c in chunk.columns:
+            if c in DATE_COLUMNS:
+                cells[c] = chunk[c].dt.strftime("%Y-%m-%d").fillna("")
+            elif c in AMOUNT_COLUMNS:
+                cells[c] = chunk[c].map(lambda v: "" if v != v else f"{v:,.2f}")
+        self.tree.delete(*self.tree.get_children())
+        for row in cells.itertuples(index=False, name=None):
+            self.tree.insert("", tk.END, values=row)
+        self.start, self.size = start, len(chunk)
+
+    def _goto(self, top: float, recenter: bool = False):
+        """Show frame row `top` first, reloading the window around it if outside."""
+        first, last = self.tree.yview()
+        shown = (last - first) * self.size
+        top   = max(0.0, min(top, len(self.df) - shown))
+        if recenter or top < self.start or top + shown > self.start + self.size:
+            self._load(top - (PREVIEW_PAGE - shown) / 2)
+        self.tree.yview_moveto((top - self.start) / max(self.size, 1))
+
+    def _yview(self, *args):
+        """Scrollbar command, in fractions of the whole frame."""
+        if self.df is None or len(self.df) <= PREVIEW_PAGE:
+            return self.tree.yview(*args)
+        first, last = self.tree.yview()
+        top = self.start + first * self.size
+        if args[0] == "moveto":
+            top = float(args[1]) * len(self.df)
+        else:       # ("scroll", n, "units" | "pages")
+            rows = round((last - first) * self.size) if args[2].startswith("page") else 1
+            top += int(args[1]) * max(rows, 1)
+        self._goto(top)
+
+    def _scrolled(self, first, last):
+        """The tree scrolled (wheel, keys): move the scrollbar, shift the window at its edges."""
+        if self.df is None or not self.size:
+            return self.yscr.set(first, last)
+        first, last, n = float(first), float(last), len(self.df)
+        self.yscr.set((self.start + first * self.size) / n, (self.start + last * self.size) / n)
+        if (first <= 0 and self.start > 0) or (last >= 1 and self.start + self.size < n):
+            self.after_idle(self._goto, self.start + first * self.size, True)
 
 class App(tk.Tk):
+    """
+    Widgets are only touched on the Tk thread: worker threads hand
+    callables to _post(), and _poll() runs them from the event loop.
+    """
+
     def __init__(self):
         super().__init__()
         self.title("Bank Statement Extractor")
-        self.geometry("800x600")
+        self.geometry("900x650")
         self.df = None
         self.extractor_name = None
+        self._warming = None
+        self._cancel  = None      # threading.Event of the running extraction
+        self._events  = queue.Queue()
         self._build_widgets()
+        self.protocol("WM_DELETE_WINDOW", self._on_exit)
+        self.after(POLL_MS, self._poll)
 
     def _build_widgets(self):
         frm_pdf = ttk.LabelFrame(self, text="Step 1: Select PDF", padding=10)
@@ -25,38 +133,71 @@ class App(tk.Tk):
         frm_btns.pack(fill=tk.X, padx=10)
         self.btn_extract = ttk.Button(frm_btns, text="Extract", command=self._on_extract)
         self.btn_extract.pack(side=tk.LEFT, padx=(0,5))
-        ttk.Button(frm_btns, text="Exit", command=self.destroy).pack(side=tk.LEFT)
+        self.btn_cancel = ttk.Button(frm_btns, text="Cancel", command=self._on_cancel,
+                                     state=tk.DISABLED)
+        self.btn_cancel.pack(side=tk.LEFT, padx=(0,5))
+        ttk.Button(frm_btns, text="Exit", command=self._on_exit).pack(side=tk.LEFT)
 
         frm_save = ttk.LabelFrame(self, text="Step 2: Save Output", padding=10)
         frm_save.pack(fill=tk.X, padx=10, pady=5)
         self.format_option = tk.StringVar(value="csv")
         ttk.Radiobutton(frm_save, text="CSV", variable=self.format_option, value="csv").pack(side=tk.LEFT, padx=5)
         ttk.Radiobutton(frm_save, text="Excel", variable=self.format_option, value="xlsx").pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(frm_save, text="Parquet", variable=self.format_option, value="parquet").pack(side=tk.LEFT, padx=5)
         self.btn_save = ttk.Button(frm_save, text="Save…", command=self._on_save, state=tk.DISABLED)
         self.btn_save.pack(side=tk.LEFT, padx=(20,0))
 
         frm_status = ttk.Frame(self, padding=10)
         frm_status.pack(fill=tk.X, padx=10)
         self.status = tk.StringVar(value="Ready")
-        ttk.Label(frm_status, textvariable=self.status).pack(side=tk.LEFT)
         self.progress = ttk.Progressbar(frm_status, length=200, maximum=1)
-        self.progress.pack(side=tk.LEFT, padx=10)
+        self.progress.pack(side=tk.LEFT, padx=(0,10))
+        ttk.Label(frm_status, textvariable=self.status).pack(side=tk.LEFT)
 
-        frm_out = ttk.LabelFrame(self, text="Metrics & Preview", padding=10)
-        frm_out.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        tabs = ttk.Notebook(self)
+        tabs.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.preview = PreviewTable(tabs)
+        tabs.add(self.preview, text="Preview")
+
+        frm_out = ttk.Frame(tabs, padding=5)
+        tabs.add(frm_out, text="Metrics")
         self.txt = tk.Text(frm_out, wrap=tk.NONE)
-        self.txt.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
         yscr = ttk.Scrollbar(frm_out, orient=tk.VERTICAL, command=self.txt.yview)
         xscr = ttk.Scrollbar(frm_out, orient=tk.HORIZONTAL, command=self.txt.xview)
         self.txt.configure(yscrollcommand=yscr.set, xscrollcommand=xscr.set)
         yscr.pack(fill=tk.Y, side=tk.RIGHT)
         xscr.pack(fill=tk.X, side=tk.BOTTOM)
+        self.txt.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
+
+    # thread hand-off
+
+    def _post(self, fn, *args):
+        """Run fn(*args) on the Tk thread; callable from any thread."""
+        self._events.put((fn, args))
+
+    def _poll(self):
+        try:
+            while True:
+                fn, args = self._events.get_nowait()
+                fn(*args)
+        except queue.Empty:
+            pass
+        self.after(POLL_MS, self._poll)
+
+    def _warm_in_background(self):
+        """Start loading the extraction stack while the user picks a file."""
+        if self._warming is None:
+            self._warming = threading.Thread(target=_warm_up, daemon=True)
+            self._warming.start()
 
     def _browse_pdf(self):
+        self._warm_in_background()
         path = filedialog.askopenfilename(filetypes=[("PDF Files","*.pdf")])
         if path:
             self.pdf_path.set(path)
 
+    # extraction
+
     def _on_extract(self):
         pdf = self.pdf_path.get().strip()
         if not pdf or not os.path.isfile(pdf):
@@ -65,66 +206,129 @@ class App(tk.Tk):
 
         self.btn_extract.config(state=tk.DISABLED)
         self.btn_save.config(state=tk.DISABLED)
+        self.btn_cancel.config(state=tk.NORMAL)
         self.txt.delete("1.0", tk.END)
-        self.progress['value'] = 0
+        self.preview.show(None)
+        self.df = None
+        self._update_status("Loading…", 0, 1)
+
+        self._cancel = threading.Event()
+        threading.Thread(target=self._run_extract, args=(pdf, self._cancel), daemon=True).start()
+
+    def _on_cancel(self):
+        if self._cancel is not None:
+            self._cancel.set()
+            self.btn_cancel.config(state=tk.DISABLED)
+            self.status.set("Cancelling…")
 
-        threading.Thread(target=self._run_extract, args=(pdf,), daemon=True).start()
+    def _on_exit(self):
+        if self._cancel is not None:
+            self._cancel.set()
+        self.destroy()
 
-    def _run_extract(self, pdf):
+    def _run_extract(self, pdf, cancel):
+        """Worker thread: never touches widgets, only posts."""
+        def progress(page, pages, extractor):
+            self._post(self._update_status, f"{extractor}: page {page} of {pages}", page, pages)
         try:
-            self._update_status("Extracting…", 0)
-            name, df, total, found, pct = auto_extract_with_metrics(pdf)
-            self.df = df
-            self._update_status("Done", 1)
-            self.after(0, lambda: self._show_metrics(name, total, found, pct, df))
-            if not df.empty:
-                self.btn_save.config(state=tk.NORMAL)
+            res = _warm_up().auto_extract_with_metrics(pdf, workers=os.cpu_count() or 1,
+                                                       progress=progress, cancel=cancel)
         except Exception as e:
-            messagebox.showerror("Extraction Error", str(e))
-        finally:
-            self.btn_extract.config(state=tk.NORMAL)
+            self._post(self._extract_failed, e, cancel.is_set())
+        else:
+            self._post(self._extract_done, res)
 
-    def _show_metrics(self, name, total, found, pct, df):
+    def _extract_done(self, res):
+        name, df, total, found, pct = res
+        self._finish_extract()
+        self.df = df
+        self.extractor_name = name
+        self._update_status(f"Done: {found} rows" if name else "No extractor matched", 1, 1)
+        self._show_metrics(name, total, found, pct, df, res.metrics)
+        if not df.empty:
+            self.preview.show(df)
+            self.btn_save.config(state=tk.NORMAL)
+
+    def _extract_failed(self, error, cancelled):
+        self._finish_extract()
+        if cancelled:
+            self._update_status("Cancelled", 0, 1)
+        else:
+            self._update_status("Failed", 0, 1)
+            messagebox.showerror("Extraction Error", str(error))
+
+    def _finish_extract(self):
+        self._cancel = None
+        self.btn_extract.config(state=tk.NORMAL)
+        self.btn_cancel.config(state=tk.DISABLED)
+
+    def _show_metrics(self, name, total, found, pct, df, metrics):
         self.txt.insert(tk.END, f"Layout: {name or 'unknown'}\n")
         self.txt.insert(tk.END, f"Possible rows: {total}\n")
         self.txt.insert(tk.END, f"Extracted rows: {found}\n")
-        self.txt.insert(tk.END, f"Accuracy: {pct:.1f}%\n\n")
-        if not df.empty:
-            self.txt.insert(tk.END, df.head(10).to_string(index=False))
-        else:
-            self.txt.insert(tk.END, "No data extracted.\n")
+        self.txt.insert(tk.END, f"Coverage: {'n/a' if pct != pct else f'{pct:.1f}%'}\n")
+        if metrics.get("balance_checked"):
+            self.txt.insert(tk.END, f"Balance check: {metrics['balance_ok']}/"
+                                    f"{metrics['balance_checked']} consistent\n")
+        short = [str(p) for p, c, f in metrics.page_coverage(name) if f < c]
+        if short:
+            self.txt.insert(tk.END, f"Pages with missed rows: {', '.join(short)}\n")
+        skipped = metrics.skipped_pages(name)
+        if skipped:
+            self.txt.insert(tk.END, f"Skipped pages (no transactions): "
+                                    f"{', '.join(map(str, skipped))}\n")
+        for a in metrics.attempts:
+            if a.get("error"):
+                self.txt.insert(tk.END, f"{a['extractor']} failed: {a['error']}\n")
+            elif "abandoned" in a:
+                self.txt.insert(tk.END, f"{a['extractor']} abandoned after page {a['abandoned']} "
+                                        f"(confidence {a['confidence']['score']:.2f})\n")
+        if df.empty:
+            self.txt.insert(tk.END, "\nNo data extracted.\n")
+        cached = " (cached result)" if metrics.get("cached") else ""
+        self.txt.insert(tk.END, f"\nTime by stage{cached}:\n{metrics.format_summary()}\n")
+
+    # saving
 
     def _on_save(self):
         if self.df is None or self.df.empty:
             return
         fmt = self.format_option.get()
         ext = f".{fmt}"
-        ftypes = [("CSV","*.csv")] if fmt=="csv" else [("Excel","*.xlsx")]
+        ftypes = {"csv": [("CSV","*.csv")], "xlsx": [("Excel","*.xlsx")],
+                  "parquet": [("Parquet","*.parquet")]}[fmt]
         path = filedialog.asksaveasfilename(defaultextension=ext, filetypes=ftypes)
         if not path:
             return
 
         self.btn_save.config(state=tk.DISABLED)
-        self._update_status("Saving…", 0)
-        threading.Thread(target=self._run_save, args=(path,fmt), daemon=True).start()
+        self._update_status("Saving…", 0, 1)
+        threading.Thread(target=self._run_save, args=(self.df, path, fmt), daemon=True).start()
 
-    def _run_save(self, path, fmt):
+    def _run_save(self, df, path, fmt):
+        """Worker thread: never touches widgets, only posts."""
         try:
-            if fmt=="csv":
-                self.df.to_csv(path, index=False, encoding='utf-8-sig')
-            else:
-                self.df.to_excel(path, index=False)
-            self._update_status(f"Saved: {os.path.basename(path)}", 1)
-            self.after(0, lambda: messagebox.showinfo("Saved", f"File saved to:\n{path}"))
+            from export import export
+            export(df, path, fmt)
         except Exception as e:
-            messagebox.showerror("Save Error", str(e))
-        finally:
-            self.btn_save.config(state=tk.NORMAL)
+            self._post(self._save_done, path, e)
+        else:
+            self._post(self._save_done, path, None)
+
+    def _save_done(self, path, error):
+        self.btn_save.config(state=tk.NORMAL)
+        if error is not None:
+            self._update_status("Save failed", 0, 1)
+            messagebox.showerror("Save Error", str(error))
+        else:
+            self._update_status(f"Saved: {os.path.basename(path)}", 1, 1)
+            messagebox.showinfo("Saved", f"File saved to:\n{path}")
 
-    def _update_status(self, text, prog):
-        self.after(0, lambda: (self.status.set(text),
-                               self.progress.config(value=prog)))
+    def _update_status(self, text, value, maximum):
+        """Tk thread only (workers go through _post)."""
+        self.status.set(text)
+        self.progress.config(value=value, maximum=maximum)
 
 if __name__ == "__main__":
     app = App()
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
@@ -0,0 +1,205 @@
+"""
+Per-stage timing and memory instrumentation for the extraction pipeline.
+
+Every ParseContext carries a Metrics object; the parse cache and the
+extractors book their work into it as stages (open, text, prefilter,
+fingerprint, words, camelot, header, rows, probe, dataframe), per extractor and per page.
+
+Environment switches:
+  BSE_TRACE_MEMORY=1   record peak traced memory per stage (tracemalloc;
+                       slows extraction down noticeably)
+  BSE_TRACE_DIR=dir    write <statement>.trace.json for every extraction
+  BSE_PROFILE=dir      run every extraction under cProfile and dump
+                       <statement>.prof (open with pstats or snakeviz)
+"""
+import cProfile, json, os, time, tracemalloc
+from contextlib import contextmanager
+
+TRACE_MEMORY = os.environ.get("BSE_TRACE_MEMORY", "") not in ("", "0")
+TRACE_DIR    = os.environ.get("BSE_TRACE_DIR") or None
+PROFILE_DIR  = os.environ.get("BSE_PROFILE") or None
+
+class Metrics:
+    """
+    Details of one extraction.
+
+    `info` holds scalar results (layout, fingerprint, score, ...) and is
+    also reachable with item access, so `metrics["layout"]` works.
+    `stages` maps (extractor, stage, page) to accumulated wall time,
+    call count and peak memory. Time spent in a nested stage is booked
+    there only, so all stages add up to the total; peak memory does
+    include nested stages.
+    `attempts` lists every extractor tried, with its rows or error, its
+    confidence and, if it was dropped early, the page it was abandoned at.
+    `coverage` maps extractor → page → [candidate lines, rows found].
+    `skipped` maps extractor → pages the prefilter kept from it.
+    """
+
+    def __init__(self, memory: bool = None):
+        self.info     = {}
+        self.stages   = {}
+        self.attempts = []
+        self.coverage = {}
+        self.skipped  = {}
+        self.memory   = tracemalloc.is_tracing() if memory is None else memory
+        self._stack   = []     # [child seconds, peak bytes] per open stage
+
+    # mapping access to `info`
+    def __getitem__(self, key):
+        return self.info[key]
+
+    def __setitem__(self, key, value):
+        self.info[key] = value
+
+    def __contains__(self, key):
+        return key in self.info
+
+    def get(self, key, default=None):
+        return self.info.get(key, default)
+
+    @contextmanager
+    def stage(self, name: str, extractor: str = None, page=None):
+        """
+        Time a block as stage `name`. Yields a dict whose "page" may be
+        filled in before the block ends (when the page is only known
+        afterwards, e.g. while pulling from a page generator).
+        """
+        tag = {"page": page}
+        if self.memory:
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._stack.append([0.0, 0])
+        t0 = time.perf_counter()
+        try:
+            yield tag
+        finally:
+            elapsed = time.perf_counter() - t0
+            child, peak = self._stack.pop()
+            if self.memory:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+            if self._stack:
+                self._stack[-1][0] += elapsed
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            self.add(name, extractor, tag["page"], elapsed - child, peak if self.memory else None)
+
+    def add(self, name: str, extractor: str, page, seconds: float, peak: int = None, calls: int = 1):
+        key = (extractor or "", name, page)
+        st  = self.stages.setdefault(key, {"seconds": 0.0, "calls": 0, "peak_kb": None})
+        st["seconds"] += seconds
+        st["calls"]   += calls
+        if peak is not None:
+            st["peak_kb"] = max(st["peak_kb"] or 0, peak // 1024)
+
+    def count_page(self, extractor: str, page: int, candidates: int, found: int):
+        """Book `found` rows against page `page`'s candidate transaction lines."""
+        cov = self.coverage.setdefault(extractor, {}).setdefault(page, [candidates, 0])
+        cov[1] += found
+
+    def page_coverage(self, extractor: str) -> list:
+        """Per-page (page, candidate lines, rows found) of one extractor."""
+        return [(p, c, f) for p, (c, f) in sorted(self.coverage.get(extractor, {}).items())]
+
+    def skip_page(self, extractor: str, page: int):
+        self.skipped.setdefault(extractor, set()).add(page)
+
+    def skipped_pages(self, extractor: str) -> list:
+        return sorted(self.skipped.get(extractor, ()))
+
+    def merge(self, other: "Metrics"):
+        """Fold in the stages, attempts, coverage and skipped pages of another run (e.g. a worker chunk)."""
+        for (extractor, name, page), st in other.stages.items():
+            peak = st["peak_kb"] * 1024 if st["peak_kb"] is not None else None
+            self.add(name, extractor, page, st["seconds"], peak, st["calls"])
+        self.attempts.extend(other.attempts)
+        for extractor, pages in other.coverage.items():
+            for page, (candidates, found) in pages.items():
+                self.count_page(extractor, page, candidates, found)
+        for extractor, pages in other.skipped.items():
+            self.skipped.setdefault(extractor, set()).update(pages)
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(st["seconds"] for st in self.stages.values())
+
+    def summary(self) -> list:
+        """
+        Stage totals over all pages as (extractor, stage, seconds,
+        calls, peak_kb) rows, slowest first.
+        """
+        agg = {}
+        for (extractor, name, _), st in self.stages.items():
+            row = agg.setdefault((extractor, name), [0.0, 0, None])
+            row[0] += st["seconds"]
+            row[1] += st["calls"]
+            if st["peak_kb"] is not None:
+                row[2] = max(row[2] or 0, st["peak_kb"])
+        rows = [(e, n, round(s, 4), c, p) for (e, n), (s, c, p) in agg.items()]
+        return sorted(rows, key=lambda r: -r[2])
+
+    def format_summary(self) -> str:
+        lines = [f"{'extractor':<14}{'stage':<13}{'seconds':>9}{'calls':>7}{'peak KB':>10}"]
+        for extractor, name, seconds, calls, peak in self.summary():
+            lines.append(f"{extractor or '-':<14}{name:<13}{seconds:>9.3f}{calls:>7}"
+                         f"{peak if peak is not None else '':>10}")
+        lines.append(f"{'total':<27}{self.total_seconds:>9.3f}")
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        return {
+            "info":     self.info,
+            "attempts": self.attempts,
+            "stages":   [dict(extractor=e, stage=n, page=p, **st)
+                         for (e, n, p), st in self.stages.items()],
+            "coverage": [dict(extractor=e, page=p, candidates=c, found=f)
+                         for e in self.coverage for p, c, f in self.page_coverage(e)],
+            "skipped":  {e: self.skipped_pages(e) for e in self.skipped},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Metrics":
+        m = cls(memory=False)
+        m.info     = dict(data.get("info", {}))
+        m.attempts = list(data.get("attempts", []))
+        for st in data.get("stages", []):
+            m.stages[(st["extractor"], st["stage"], st["page"])] = {
+                "seconds": st["seconds"], "calls": st["calls"], "peak_kb": st["peak_kb"]}
+        for cov in data.get("coverage", []):
+            m.count_page(cov["extractor"], cov["page"], cov["candidates"], cov["found"])
+        m.skipped = {e: set(pages) for e, pages in data.get("skipped", {}).items()}
+        return m
+
+    def write_trace(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(self.to_dict(), fh, indent=2, default=str, ensure_ascii=False)
+
+def _stem(pdf_path: str) -> str:
+    return os.path.splitext(os.path.basename(pdf_path))[0]
+
+@contextmanager
+def instrumented(pdf_path: str, trace_path: str = None):
+    """
+    Wrap one extraction: honour BSE_TRACE_MEMORY and BSE_PROFILE while
+    it runs, then write the JSON trace (to `trace_path`, or into
+    BSE_TRACE_DIR). Yields a dict whose "metrics" entry the caller fills.
+    """
+    started_tracing = TRACE_MEMORY and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    prof = cProfile.Profile() if PROFILE_DIR else None
+    if prof:
+        prof.enable()
+    out = {"metrics": None}
+    try:
+        yield out
+    finally:
+        if prof:
+            prof.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            prof.dump_stats(os.path.join(PROFILE_DIR, _stem(pdf_path) + ".prof"))
+        if started_tracing:
+            tracemalloc.stop()
+        trace_path = trace_path or (TRACE_DIR and os.path.join(TRACE_DIR, _stem(pdf_path) + ".trace.json"))
+        if trace_path and out["metrics"] is not None:
+            out["metrics"].write_trace(trace_path)
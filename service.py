@@ -0,0 +1,351 @@
+"""
+Local HTTP extraction service.
+
+Accepts PDF uploads, queues them for a bounded pool of worker
+processes running auto_extract_with_metrics, and serves each job's
+status, metrics and result. Standard library only (asyncio):
+
+    python service.py --port 8765 --workers 4 --queue 64
+
+    POST   /jobs                  body: the PDF (?name=estado.pdf) → 202 {"id": ...}
+    GET    /jobs                  all known jobs
+    GET    /jobs/<id>             status, layout, rows, coverage, metrics
+    GET    /jobs/<id>/result      ?format=json (default) or csv
+    DELETE /jobs/<id>             cancel
+    GET    /health                queue and worker counts
+
+A full queue answers 503 with Retry-After before the upload is read,
+so clients back off instead of piling uploads into memory; so does an
+upload arriving while BSE_MAX_UPLOADS (default 4) others are still
+being received. A cancelled queued job never runs; a
+cancelled running job finishes in its worker but its result is dropped.
+Finished jobs are forgotten after BSE_JOB_TTL seconds (default 3600).
+"""
+import argparse, asyncio, json, os, shutil, sys, tempfile, time, uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+
+MAX_UPLOAD   = int(os.environ.get("BSE_MAX_UPLOAD_MB", "100")) * 1024 * 1024
+JOB_TTL      = float(os.environ.get("BSE_JOB_TTL", "3600"))
+MAX_UPLOADS  = int(os.environ.get("BSE_MAX_UPLOADS", "4"))
+READ_TIMEOUT = 60      # seconds to receive a request
+FINISHED     = ("done", "failed", "cancelled")
+
+# ─── worker ──────────────────────────────────────────────────
+
+def extract_job(pdf_path: str, use_cache: bool = True) -> tuple:
+    """Run in a worker process: (layout, df, total, found, pct, metrics)."""
+    from extractors import auto_extract_with_metrics
+
+    res = auto_extract_with_metrics(pdf_path, use_cache=use_cache)
+    return tuple(res) + (res.metrics,)
+
+# ─── jobs ────────────────────────────────────────────────────
+
+class Job:
+    def __init__(self, name: str, path: str):
+        self.id        = uuid.uuid4().hex
+        self.name      = name
+        self.path      = path
+        self.status    = "queued"
+        self.submitted = time.time()
+        self.started   = None
+        self.finished  = None
+        self.error     = None
+        self.result    = None     # (layout, df, total, found, pct, metrics)
+
+    def describe(self, detail: bool = True) -> dict:
+        out = {"id": self.id, "name": self.name, "status": self.status,
+               "submitted": self.submitted, "started": self.started,
+               "finished": self.finished, "error": self.error}
+        if self.result is not None:
+            layout, df, total, found, pct, metrics = self.result
+            out.update(layout=layout, rows=found, candidates=total,
+                       coverage=None if pct != pct else pct)
+            if detail:
+                out["metrics"] = {
+                    "info":    metrics.info,
+                    "skipped": {e: metrics.skipped_pages(e) for e in metrics.skipped},
+                    "stages":  [dict(extractor=e, stage=n, seconds=s, calls=c, peak_kb=p)
+                                for e, n, s, c, p in metrics.summary()],
+                }
+        return out
+
+class Service:
+    """
+    The job table, the bounded queue feeding it and the process pool.
+    One dispatcher task per worker process keeps at most `workers`
+    extractions in flight; at most `uploads` request bodies are held in
+    memory at once.
+    """
+
+    def __init__(self, workers: int = None, queue_size: int = 64, use_cache: bool = True,
+                 log=sys.stderr, uploads: int = MAX_UPLOADS):
+        self.workers   = workers or os.cpu_count() or 1
+        self.use_cache = use_cache
+        self.log       = log
+        self.jobs      = {}
+        self.queue     = asyncio.Queue(maxsize=queue_size)
+        self.running   = 0
+        self.uploads   = asyncio.Semaphore(uploads)
+        self.spool     = tempfile.mkdtemp(prefix="bse-service-")
+        self.pool      = ProcessPoolExecutor(max_workers=self.workers)
+        self._tasks    = []
+
+    async def start(self, host: str, port: int):
+        self._tasks = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        for t in self._tasks:
+            t.cancel()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        shutil.rmtree(self.spool, ignore_errors=True)
+
+    # job life cycle
+
+    async def submit(self, name: str, data: bytes) -> Job:
+        """
+        Spool an upload (in a thread, off the event loop) and queue it;
+        raises asyncio.QueueFull when saturated.
+        """
+        if self.queue.full():
+            raise asyncio.QueueFull
+        job = Job(name, None)
+        job.path = os.path.join(self.spool, job.id + ".pdf")
+        await asyncio.get_running_loop().run_in_executor(None, _spool, job.path, data)
+        try:
+            self.queue.put_nowait(job)      # others may have filled it meanwhile
+        except asyncio.QueueFull:
+            self._discard(job)
+            raise
+        self.jobs[job.id] = job
+        print(f"[service] queued {job.id} {name} ({len(data)//1024} KB)", file=self.log)
+        return job
+
+    def cancel(self, job: Job):
+        if job.status in FINISHED:
+            return
+        if job.status == "queued":
+            self._discard(job)
+        job.status   = "cancelled"
+        job.finished = time.time()
+
+    def expire(self):
+        """Forget finished jobs older than JOB_TTL."""
+        cutoff = time.time() - JOB_TTL
+        for jid in [j.id for j in self.jobs.values()
+                    if j.status in FINISHED and j.finished < cutoff]:
+            del self.jobs[jid]
+
+    def _discard(self, job: Job):
+        try:
+            os.remove(job.path)
+        except OSError:
+            pass
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            if job.status != "queued":
+                continue
+            job.status, job.started = "running", time.time()
+            self.running += 1
+            pool = self.pool
+            try:
+                result = await loop.run_in_executor(pool, extract_job, job.path, self.use_cache)
+            except BrokenProcessPool:
+                result, job.error = None, "worker crashed"
+                if pool is self.pool:       # the first to notice replaces the pool
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            except Exception as e:
+                result, job.error = None, f"{type(e).__name__}: {e}"
+            finally:
+                self.running -= 1
+                self._discard(job)
+            if job.status == "cancelled":
+                continue
+            job.result   = result
+            job.status   = "failed" if job.error else "done"
+            job.finished = time.time()
+            print(f"[service] {job.status} {job.id} {job.name} in "
+                  f"{job.finished - job.started:.1f}s", file=self.log)
+
+    # HTTP
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(self._request(reader), READ_TIMEOUT)
+            if len(request) == 2:
+                status, headers, body = request[1]
+            elif request[2]:
+                status, headers, body = await self._upload(reader, *request)
+            else:
+                status, headers, body = await self._routed(*request[:2], b"")
+        except asyncio.TimeoutError:
+            status, headers, body = _json(HTTPStatus.REQUEST_TIMEOUT, {"error": "request timed out"})
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        except Exception as e:
+            print(f"[service] request failed: {type(e).__name__}: {e}", file=self.log)
+            status, headers, body = _json(HTTPStatus.INTERNAL_SERVER_ERROR,
+                                          {"error": "internal error"})
+        reason = HTTPStatus(status).phrase
+        head = [f"HTTP/1.1 {status} {reason}", f"Content-Length: {len(body)}",
+                "Connection: close"] + [f"{k}: {v}" for k, v in headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def _request(self, reader: asyncio.StreamReader) -> tuple:
+        """
+        Read one request's head: (method, url, body length), or
+        ("reply", response) when it is refused before routing.
+        """
+        line = (await reader.readline()).decode("latin-1").split()
+        if len(line) != 3:
+            return "reply", _json(HTTPStatus.BAD_REQUEST, {"error": "malformed request line"})
+        method, target, _ = line
+        headers = {}
+        while True:
+            h = (await reader.readline()).decode("latin-1").strip()
+            if not h:
+                break
+            k, _, v = h.partition(":")
+            headers[k.strip().lower()] = v.strip()
+        length = 0
+        if method in ("POST", "PUT"):
+            if "content-length" not in headers:
+                return "reply", _json(HTTPStatus.LENGTH_REQUIRED,
+                                      {"error": "Content-Length required"})
+            length = headers["content-length"]
+            if not length.isascii() or not length.isdigit():
+                return "reply", _json(HTTPStatus.BAD_REQUEST, {"error": "invalid Content-Length"})
+            length = int(length)
+            if length > MAX_UPLOAD:
+                return "reply", _json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                      {"error": f"upload over {MAX_UPLOAD // (1024*1024)} MB"})
+        return method, urlsplit(target), length
+
+    async def _upload(self, reader: asyncio.StreamReader, method: str, url, length: int) -> tuple:
+        """
+        Read a request body and route it while holding an upload slot.
+        Refused before the body is read when the queue is full or every
+        slot is taken.
+        """
+        if self.queue.full() or self.uploads.locked():
+            return _busy()
+        async with self.uploads:
+            body = await asyncio.wait_for(reader.readexactly(length), READ_TIMEOUT)
+            return await self._routed(method, url, body)
+
+    async def _routed(self, method: str, url, body: bytes) -> tuple:
+        return await self.route(method, url.path.rstrip("/") or "/", parse_qs(url.query), body)
+
+    async def route(self, method: str, path: str, query: dict, body: bytes) -> tuple:
+        self.expire()
+        parts = path.strip("/").split("/")
+        if path == "/health" and method == "GET":
+            return _json(HTTPStatus.OK, {"queued": self.queue.qsize(), "running": self.running,
+                                         "workers": self.workers, "jobs": len(self.jobs)})
+        if parts[0] != "jobs" or len(parts) > 3:
+            return _json(HTTPStatus.NOT_FOUND, {"error": "no such endpoint"})
+
+        if len(parts) == 1:
+            if method == "GET":
+                return _json(HTTPStatus.OK, [j.describe(detail=False) for j in self.jobs.values()])
+            if method != "POST":
+                return _json(HTTPStatus.METHOD_NOT_ALLOWED, {"error": "use GET or POST"})
+            if not body.startswith(b"%PDF"):
+                return _json(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, {"error": "body is not a PDF"})
+            name = query.get("name", ["upload.pdf"])[0]
+            try:
+                job = await self.submit(name, body)
+            except asyncio.QueueFull:
+                return _busy()
+            return _json(HTTPStatus.ACCEPTED, job.describe(), {"Location": f"/jobs/{job.id}"})
+
+        job = self.jobs.get(parts[1])
+        if job is None:
+            return _json(HTTPStatus.NOT_FOUND, {"error": "no such job"})
+        if len(parts) == 2:
+            if method == "GET":
+                return _json(HTTPStatus.OK, job.describe())
+            if method == "DELETE":
+                self.cancel(job)
+                return _json(HTTPStatus.OK, job.describe(detail=False))
+            return _json(HTTPStatus.METHOD_NOT_ALLOWED, {"error": "use GET or DELETE"})
+        if parts[2] != "result" or method != "GET":
+            return _json(HTTPStatus.NOT_FOUND, {"error": "no such endpoint"})
+        if job.status != "done":
+            return _json(HTTPStatus.CONFLICT, {"error": f"job is {job.status}"})
+        # serializing a large result would block every other client
+        return await asyncio.get_running_loop().run_in_executor(
+            None, _result, job, query.get("format", ["json"])[0])
+
+def _spool(path: str, data: bytes):
+    with open(path, "wb") as fh:
+        fh.write(data)
+
+def _json(status: int, data, headers: dict = None) -> tuple:
+    body = json.dumps(data, default=str, ensure_ascii=False).encode("utf-8")
+    return status, {"Content-Type": "application/json; charset=utf-8", **(headers or {})}, body
+
+def _busy() -> tuple:
+    return _json(HTTPStatus.SERVICE_UNAVAILABLE, {"error": "queue full, retry later"},
+                 {"Retry-After": "5"})
+
+def _result(job: Job, fmt: str) -> tuple:
+    from export import CSV_DATE
+    from extractors import to_units
+
+    df = to_units(job.result[1])
+    if fmt == "csv":
+        body = df.to_csv(index=False, date_format=CSV_DATE).encode("utf-8-sig")
+        return HTTPStatus.OK, {"Content-Type": "text/csv; charset=utf-8",
+                               "Content-Disposition": f'attachment; filename="{job.id}.csv"'}, body
+    if fmt == "json":
+        body = df.to_json(orient="records", date_format="iso", force_ascii=False).encode("utf-8")
+        return HTTPStatus.OK, {"Content-Type": "application/json; charset=utf-8"}, body
+    return _json(HTTPStatus.BAD_REQUEST, {"error": "format must be csv or json"})
+
+# ─── command line ────────────────────────────────────────────
+
+async def serve(host: str, port: int, workers: int, queue_size: int, use_cache: bool):
+    service = Service(workers, queue_size, use_cache)
+    server  = await service.start(host, port)
+    print(f"[service] listening on http://{host}:{port} with {service.workers} workers",
+          file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Serve statement extraction over local HTTP.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("-p", "--port", type=int, default=8765)
+    ap.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                    help="worker processes (default: CPU count)")
+    ap.add_argument("-q", "--queue", type=int, default=64,
+                    help="jobs waiting beyond the running ones before uploads get 503")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="re-extract even if a cached result exists")
+    args = ap.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.queue, not args.no_cache))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Tests for the on-disk result cache: hits, misses, eviction, and
+invalidation when a layout or the engine settings change.
+
+    python -m pytest tests
+"""
+import os, sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT]
+
+import extractors
+from cache import ResultCache
+
+META = {"total": 2, "found": 2, "pct": 100.0}
+
+def _frame(rows: int = 2) -> pd.DataFrame:
+    return pd.DataFrame({"Descripción": [f"MOV {i}" for i in range(rows)],
+                         "Saldo": list(range(rows))})
+
+@pytest.fixture
+def store(tmp_path):
+    with ResultCache(root=str(tmp_path / "cache")) as store:
+        yield store
+
+def test_hit_and_miss(store):
+    versions = {"bbva": "v1", "": "all"}
+    assert store.get("doc", versions) is None
+    store.put("doc", "bbva", "v1", _frame(), META)
+    name, df, meta = store.get("doc", versions)
+    assert name == "bbva" and meta == META
+    pd.testing.assert_frame_equal(df, _frame())
+    assert store.get("other", versions) is None
+
+def test_no_match_is_cached(store):
+    store.put("doc", None, "all", pd.DataFrame(), META)
+    name, df, _ = store.get("doc", {"": "all"})
+    assert name is None and df.empty
+    assert store.get("doc", {"": "changed"}) is None
+
+def test_stale_entry_is_dropped(store):
+    store.put("doc", "bbva", "v1", _frame(), META)
+    assert store.get("doc", {"bbva": "v2"}) is None
+    assert store.get("doc", {"bbva": "v1"}) is None
+    assert [f for f in os.listdir(store.root) if f.endswith(".parquet")] == []
+
+def test_eviction_drops_least_recently_used(store):
+    store.put("old", "bbva", "v1", _frame(), META)
+    size = os.path.getsize(os.path.join(store.root, "old-bbva-v1.parquet"))
+    store.max_bytes = 2 * size
+    store.put("new", "bbva", "v1", _frame(), META)
+    assert store.get("old", {"bbva": "v1"}) is not None      # now the most recent
+    store.put("third", "bbva", "v1", _frame(), META)
+    assert store.get("new", {"bbva": "v1"}) is None
+    assert store.get("old", {"bbva": "v1"}) is not None
+    assert store.get("third", {"bbva": "v1"}) is not None
+
+def test_layout_change_invalidates(store, monkeypatch):
+    versions = extractors.layout_versions()
+    store.put("doc", "bbva", versions["bbva"], _frame(), META)
+    store.put("cover", None, versions[""], pd.DataFrame(), META)
+    monkeypatch.setattr(extractors.LAYOUTS["bbva"].table, "skip", 1)
+    changed = extractors.layout_versions()
+    assert store.get("doc", changed) is None
+    assert store.get("cover", changed) is None
+
+@pytest.mark.parametrize("setting, value", [("PROBE_MIN", 0.9), ("FINGERPRINT_MIN", 0.1),
+                                            ("FINGERPRINT_PAGES", 1), ("TABLE_ENGINE", "camelot"),
+                                            ("PREFILTER", False)])
+def test_engine_settings_change_every_version(monkeypatch, setting, value):
+    before = extractors.layout_versions()
+    monkeypatch.setattr(extractors, setting, value)
+    monkeypatch.setattr(extractors, "_engine_hash", None)
+    after = extractors.layout_versions()
+    assert all(after[name] != before[name] for name in before)
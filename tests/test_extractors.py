@@ -0,0 +1,164 @@
+"""
+Regression tests for the layout specs, the combined matcher, early
+abort and page-parallel extraction, run on the synthetic statements of
+benchmarks/synthetic.py (generated once per session, no fixtures kept
+in the repository):
+
+    python -m pytest tests
+"""
+import os, sys, tracemalloc
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+import extractors
+from synthetic import HEADERS, LAYOUTS, OPENING, statement, write_pdf
+
+PAGES = 3
+
+# banorte0 and banorte1 print the same header and transaction lines, so
+# detection cannot tell them apart and the earlier layout wins the tie;
+# banorte0 reads banorte1's rows, without its continuation lines
+DETECTED = {"banorte1": "banorte0"}
+
+@pytest.fixture(scope="session")
+def statements(tmp_path_factory):
+    """layout → (path, transactions written) of a PAGES-page statement."""
+    folder = tmp_path_factory.mktemp("statements")
+    return {layout: (str(folder / f"{layout}.pdf"),
+                     statement(layout, str(folder / f"{layout}.pdf"), PAGES))
+            for layout in LAYOUTS}
+
+def _check_amounts(df: pd.DataFrame):
+    """Every balance follows from the amounts booked since the opening balance."""
+    moved = (df["Depósitos"] - df["Retiros"]).cumsum()
+    assert (df["Saldo"] - moved == round(OPENING * 100)).all()
+    assert df["Depósitos"].sum() > 0 and df["Retiros"].sum() > 0
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_extractor(statements, layout):
+    path, written = statements[layout]
+    df = dict(extractors.EXTRACTORS)[layout](path)
+    assert list(df.columns) == list(extractors.COLUMNS)
+    assert len(df) == written
+    assert df["Fecha"].notna().all()
+    assert df["Fecha Texto"].isna().all()
+    _check_amounts(df)
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_auto_extract(statements, layout):
+    path, written = statements[layout]
+    res = extractors.auto_extract_with_metrics(path, use_cache=False)
+    name, df, total, found, pct = res
+    assert name == DETECTED.get(layout, layout)
+    assert found == written == total
+    _check_amounts(df)
+    chosen = next(a for a in res.metrics.attempts if a["extractor"] == name)
+    assert chosen["confidence"]["score"] >= extractors.PROBE_MIN
+    assert "abandoned" not in chosen
+
+def test_probe_abandons_wrong_layout(statements):
+    path, _ = statements["citibanamex1"]
+    with extractors.ParseContext(path) as ctx:
+        df = extractors._attempt("bbva", extractors.bbva, path, ctx)
+    attempt = ctx.metrics.attempts[-1]
+    assert df.empty
+    assert attempt["confidence"]["score"] < extractors.PROBE_MIN
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_parallel_matches_serial(statements, tmp_path, layout):
+    path = str(tmp_path / f"{layout}_10.pdf")
+    statement(layout, path, 10)
+    serial   = dict(extractors.EXTRACTORS)[layout](path)
+    parallel = extractors.extract_parallel(path, layout, workers=2, chunk_pages=3)
+    pd.testing.assert_frame_equal(parallel, serial)
+
+def test_streaming_memory_stays_flat(tmp_path):
+    """Released pages give their parsed objects back: no growth per page."""
+    path = str(tmp_path / "long.pdf")
+    statement("banorte0", path, 16)
+    tracemalloc.start()
+    try:
+        held = [tracemalloc.get_traced_memory()[0]
+                for _ in extractors.iter_transactions(path, layout="banorte0")]
+    finally:
+        tracemalloc.stop()
+    assert len(held) == 16
+    assert held[-1] - held[3] < 2 * 2**20
+
+def test_matcher_agrees_with_each_pattern(statements):
+    seen = 0
+    for path, _ in statements.values():
+        with extractors.ParseContext(path) as ctx:
+            for p in ctx.pages:
+                lines = ctx.text(p).splitlines()
+                seen += len(lines)
+                hits = extractors.MATCHER.hits(lines)
+                for name, spec in extractors.LAYOUTS.items():
+                    assert hits[name] == sum(1 for L in lines if spec.line.match(L))
+    assert seen
+
+def test_prefilter_keeps_transaction_pages(statements):
+    for layout, (path, _) in statements.items():
+        with extractors.ParseContext(path) as ctx:
+            for p in ctx.pages:
+                assert layout in ctx.page_layouts(p)
+
+def test_layout_version_follows_spec(monkeypatch):
+    before = extractors.layout_versions()
+    monkeypatch.setattr(extractors.LAYOUTS["bbva"].table, "skip", 1)
+    after = extractors.layout_versions()
+    assert after["bbva"] != before["bbva"] and after[""] != before[""]
+    assert all(after[n] == before[n] for n in before if n not in ("bbva", ""))
+
+def test_banbajio_without_reference_column(tmp_path):
+    """No. Ref. is optional: a header without it still gives the table's columns."""
+    items = [(x, 730, t) for x, t in HEADERS["banbajio"] if t != "NO. REF."] + [
+             (160, 718, "(detalle)"),
+             (40, 706, "3 ENE"), (160, 706, "TRASPASO A"), (380, 706, "500.00"),
+             (540, 706, "10,500.00"),
+             (40, 694, "4 ENE"), (160, 694, "TRASPASO B"), (460, 694, "200.00"),
+             (540, 694, "10,300.00")]
+    path = str(tmp_path / "no_ref.pdf")
+    write_pdf(path, [items])
+    with extractors.ParseContext(path) as ctx:
+        assert "banbajio" in ctx.page_layouts(1)
+        ctx.extractor = "banbajio"
+        assert ctx.word_tables(1) is not None       # no Camelot fallback
+        df = extractors.banbajio(path, ctx)
+    assert df["Descripción"].tolist() == ["TRASPASO A", "TRASPASO B"]
+    assert df["No. Ref."].isna().all() and df["Saldo"].tolist() == [1050000, 1030000]
+
+def test_parse_amounts():
+    got = extractors.parse_amounts(["1,234.56", "(1,234.56)", "1,234.56-", "$ -5.00",
+                                    "", "$", "-", None, "N/A"])
+    assert got.iloc[:8].tolist() == [1234.56, -1234.56, -1234.56, -5.0, 0.0, 0.0, 0.0, 0.0]
+    assert pd.isna(got.iloc[8]) and pd.isna(extractors.parse_cents(["N/A"]).iloc[0])
+
+def test_citibanamex0_amounts_carry_no_sign(tmp_path):
+    """citibanamex0 prints no signs: parentheses and dashes are decoration."""
+    items = [(x, 730, t) for x, t in HEADERS["citibanamex0"]] + [
+             (40, 718, "05 ENE"), (110, 718, "PAGO"), (380, 718, "(1,234.56)"),
+             (540, 718, "8,765.44"),
+             (40, 706, "06 ENE"), (110, 706, "ABONO"), (460, 706, "100.00-"),
+             (540, 706, "8,865.44")]
+    path = str(tmp_path / "signs.pdf")
+    write_pdf(path, [items])
+    df = extractors.citibanamex0(path)
+    assert df["Retiros"].tolist() == [123456, 0] and df["Depósitos"].tolist() == [0, 10000]
+
+def test_dates_without_a_year(tmp_path):
+    """No year anywhere: dates take the current period, unparsable ones stay as text."""
+    items = [(40, 730, "FECHA  CONCEPTO  RETIROS  DEPOSITOS  SALDO"),
+             (40, 700, "5 ENE DEPOSITO EFECTIVO"),
+             (40, 688, "HORA 12:00 AUT 000001  100.00  1,100.00"),
+             (40, 670, "99 XYZ PAGO"),
+             (40, 658, "HORA 12:00 AUT 000002  50.00  1,050.00")]
+    path = str(tmp_path / "no_year.pdf")
+    write_pdf(path, [items])
+    df = extractors.citibanamex1(path)
+    assert pd.notna(df["Fecha"].iloc[0]) and df["Fecha"].iloc[0].month == 1
+    assert pd.isna(df["Fecha"].iloc[1]) and df["Fecha Texto"].iloc[1] == "99 XYZ"
@@ -0,0 +1,107 @@
+"""
+Tests for the HTTP service, driven over real connections
+(asyncio.open_connection) against Service on a free local port.
+
+    python -m pytest tests
+"""
+import asyncio, json, os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+from service import Job, Service
+from synthetic import statement
+
+async def _call(port: int, method: str, path: str, body: bytes = b"",
+                headers: dict = None, send_body: bool = True) -> tuple:
+    """(status, headers, body) of one request; the body may be withheld."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    head = {"Content-Length": str(len(body))} if method == "POST" else {}
+    head.update(headers or {})
+    writer.write((f"{method} {path} HTTP/1.1\r\n" +
+                  "".join(f"{k}: {v}\r\n" for k, v in head.items()) + "\r\n").encode("latin-1"))
+    if send_body:
+        writer.write(body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    reply = {}
+    while (line := (await reader.readline()).decode("latin-1").strip()):
+        k, _, v = line.partition(":")
+        reply[k.strip().lower()] = v.strip()
+    data = await reader.readexactly(int(reply["content-length"]))
+    writer.close()
+    return status, reply, data
+
+def _serve(test, dispatch: bool = True, **kw):
+    """Run `test(service, port)` against a fresh service."""
+    async def main():
+        service = Service(workers=1, use_cache=False, log=open(os.devnull, "w"), **kw)
+        if dispatch:
+            server = await service.start("127.0.0.1", 0)
+        else:       # nothing drains the queue
+            server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+        try:
+            async with server:
+                await asyncio.wait_for(test(service, server.sockets[0].getsockname()[1]), 120)
+        finally:
+            service.close()
+    asyncio.run(main())
+
+def test_upload_extract_and_fetch(tmp_path):
+    path = str(tmp_path / "bbva.pdf")
+    written = statement("bbva", path, 2)
+    with open(path, "rb") as fh:
+        pdf = fh.read()
+
+    async def test(service, port):
+        status, headers, body = await _call(port, "POST", "/jobs?name=bbva.pdf", pdf)
+        assert status == 202
+        job = json.loads(body)["id"]
+        assert headers["location"] == f"/jobs/{job}"
+        while True:
+            status, _, body = await _call(port, "GET", f"/jobs/{job}")
+            info = json.loads(body)
+            if info["status"] not in ("queued", "running"):
+                break
+            await asyncio.sleep(0.2)
+        assert info["status"] == "done" and info["layout"] == "bbva"
+        assert info["rows"] == written
+        status, _, body = await _call(port, "GET", f"/jobs/{job}/result?format=json")
+        assert status == 200 and len(json.loads(body)) == written
+
+    _serve(test)
+
+def test_full_queue_refuses_before_reading_the_body():
+    async def test(service, port):
+        service.queue.put_nowait(Job("waiting.pdf", os.devnull))
+        status, headers, _ = await _call(port, "POST", "/jobs", b"%PDF" + b"0" * 100_000,
+                                         send_body=False)
+        assert status == 503 and headers["retry-after"] == "5"
+        assert not service.jobs
+
+    _serve(test, dispatch=False, queue_size=1)
+
+def test_uploads_in_flight_are_limited():
+    async def test(service, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"POST /jobs HTTP/1.1\r\nContent-Length: 10\r\n\r\n%PDF")
+        await writer.drain()
+        while not service.uploads.locked():         # the first upload holds the only slot
+            await asyncio.sleep(0.01)
+        status, _, _ = await _call(port, "POST", "/jobs", b"%PDF", send_body=False)
+        assert status == 503
+        writer.write(b"-1.4 x")
+        await writer.drain()
+        assert int((await reader.readline()).split()[1]) == 202
+        writer.close()
+
+    _serve(test, dispatch=False, uploads=1)
+
+def test_bad_requests():
+    async def test(service, port):
+        assert (await _call(port, "POST", "/jobs", headers={"Content-Length": "-1"}))[0] == 400
+        assert (await _call(port, "POST", "/jobs", b"not a pdf"))[0] == 415
+        assert (await _call(port, "GET", "/jobs/nope"))[0] == 404
+        assert (await _call(port, "GET", "/health"))[0] == 200
+
+    _serve(test, dispatch=False)
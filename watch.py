@@ -0,0 +1,298 @@
+"""
+Watch-folder ingestion.
+
+Polls a drop folder and extracts only new or changed statements. A
+SQLite index remembers every file's size, mtime, SHA-256, layout,
+account and status, so unchanged files cost one stat() each; changed
+ones are hashed first, and a copy of an already ingested statement is
+not extracted again. Transactions go into a consolidated store in the
+same database, keyed by account and date, where overlapping statements
+do not duplicate rows:
+
+    python watch.py drop/ --db ingest.sqlite --interval 60
+    python watch.py drop/ --once --export all.xlsx
+
+Files modified in the last --settle seconds are left for the next poll,
+so statements still being copied in are not read half-written.
+"""
+import argparse, os, sqlite3, sys, time
+import pandas as pd
+
+from batch import find_pdfs, run_batch
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path     TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest   TEXT NOT NULL,
+    layout   TEXT,
+    account  TEXT,
+    rows     INTEGER,
+    added    INTEGER,
+    status   TEXT NOT NULL,      -- done | failed | duplicate
+    error    TEXT,
+    seen     REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS files_digest ON files (digest);
+CREATE TABLE IF NOT EXISTS transactions (
+    account     TEXT NOT NULL,
+    fecha       TEXT NOT NULL,
+    seq         INTEGER NOT NULL,    -- nth identical row of that day in a statement
+    ref         TEXT NOT NULL,
+    descripcion TEXT NOT NULL,
+    deposito    INTEGER NOT NULL,    -- cents
+    retiro      INTEGER NOT NULL,
+    saldo       INTEGER NOT NULL,
+    fecha_liq   TEXT,
+    saldo_liq   INTEGER,
+    fecha_texto TEXT,                -- printed date of rows whose fecha did not parse
+    source      TEXT NOT NULL,
+    PRIMARY KEY (account, fecha, seq, ref, descripcion, deposito, retiro, saldo)
+) WITHOUT ROWID;
+"""
+
+# store column → (frame column, key part)
+STORE_COLUMNS = {
+    "fecha":       ("Fecha", True),
+    "ref":         ("No. Ref.", True),
+    "descripcion": ("Descripción", True),
+    "deposito":    ("Depósitos", True),
+    "retiro":      ("Retiros", True),
+    "saldo":       ("Saldo", True),
+    "fecha_liq":   ("Fecha Liq.", False),
+    "saldo_liq":   ("Saldo Liq.", False),
+    "fecha_texto": ("Fecha Texto", False),
+}
+
+class IngestStore:
+    """
+    The file index and the consolidated transaction store, in one
+    SQLite database.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # file index
+
+    def known(self) -> dict:
+        """path → (size, mtime_ns, digest, status) of every indexed file."""
+        return {r[0]: r[1:] for r in
+                self.db.execute("SELECT path, size, mtime_ns, digest, status FROM files")}
+
+    def done_digest(self, digest: str):
+        """(layout, account, rows) of an ingested file with these contents, or None."""
+        return self.db.execute("SELECT layout, account, rows FROM files "
+                               "WHERE digest=? AND status='done' LIMIT 1", (digest,)).fetchone()
+
+    def record(self, path: str, st: os.stat_result, digest: str, status: str,
+               layout: str = None, account: str = None, rows: int = None,
+               added: int = None, error: str = None):
+        self.db.execute("INSERT OR REPLACE INTO files VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                        (path, st.st_size, st.st_mtime_ns, digest, layout, account,
+                         rows, added, status, error, time.time()))
+
+    def touch(self, path: str, st: os.stat_result):
+        """Same contents, new mtime: remember it so the file is not hashed again."""
+        self.db.execute("UPDATE files SET mtime_ns=?, seen=? WHERE path=?",
+                        (st.st_mtime_ns, time.time(), path))
+
+    # transactions
+
+    def add(self, df: pd.DataFrame, account: str, source: str) -> int:
+        """
+        Insert a statement's rows, skipping ones already stored; returns
+        rows added. Rows with an unreadable amount (NA) cannot be keyed
+        and are left out with a warning.
+        """
+        rec = pd.DataFrame({col: df[src] for col, (src, _) in STORE_COLUMNS.items()})
+        unread = rec[["deposito", "retiro", "saldo"]].isna().any(axis=1)
+        if unread.any():
+            print(f"[watch] {source}: {int(unread.sum())} rows with unreadable amounts "
+                  f"not stored", file=sys.stderr)
+            rec = rec[~unread]
+        for col in ("fecha", "fecha_liq"):
+            rec[col] = rec[col].dt.strftime("%Y-%m-%d")
+        rec["fecha"] = rec["fecha"].fillna("")
+        for col in ("ref", "descripcion"):
+            rec[col] = rec[col].astype(object).fillna("").astype(str)
+        for col in ("deposito", "retiro", "saldo", "saldo_liq", "fecha_texto"):
+            rec[col] = rec[col].astype(object).where(rec[col].notna(), None)
+        key = [col for col, (_, part) in STORE_COLUMNS.items() if part]
+        # identical rows on one day (same amounts, no balance printed)
+        # are told apart by their order, which overlapping statements share
+        rec["seq"] = rec.groupby(key, sort=False).cumcount()
+        rec.insert(0, "account", account)
+        rec["source"] = source
+
+        cols   = list(rec.columns)
+        before = self.db.total_changes
+        self.db.executemany(f"INSERT OR IGNORE INTO transactions ({', '.join(cols)}) "
+                            f"VALUES ({', '.join('?' * len(cols))})",
+                            rec.itertuples(index=False, name=None))
+        return self.db.total_changes - before
+
+    def commit(self):
+        self.db.commit()
+
+    def transactions(self, account: str = None) -> pd.DataFrame:
+        """The stored transactions as the extractors' schema, plus "Cuenta"."""
+        from extractors import COLUMNS, typed
+        sql = "SELECT * FROM transactions"
+        rec = pd.read_sql_query(sql + (" WHERE account=?" if account else "") +
+                                " ORDER BY account, fecha, seq", self.db,
+                                params=(account,) if account else None)
+        df = pd.DataFrame({src: rec[col] for col, (src, _) in STORE_COLUMNS.items()})
+        df["No. Ref."] = df["No. Ref."].replace("", None)
+        for col in ("Fecha", "Fecha Liq."):
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+        df = typed(df.reindex(columns=COLUMNS))
+        df.insert(0, "Cuenta", rec["account"])
+        return df
+
+# ─── one poll ────────────────────────────────────────────────
+
+def scan(folder: str, store: IngestStore, settle: float = 0,
+         retry_failed: bool = False, log=sys.stderr) -> list:
+    """
+    Compare the folder with the index and return the PDFs to extract
+    as (path, stat, digest). Unchanged files (same size and mtime) are
+    skipped without being read; changed ones are hashed, and files whose
+    contents were already ingested under another name are recorded as
+    duplicates.
+    """
+    from cache import file_digest
+
+    known   = store.known()
+    now     = time.time()
+    todo    = []
+    pending = set()         # digests already queued in this poll
+    for path in find_pdfs(folder):
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        old = known.get(path)
+        if old is not None and old[:2] == (st.st_size, st.st_mtime_ns):
+            if old[3] != "failed" or not retry_failed:
+                continue
+        if now - st.st_mtime < settle:
+            continue        # still being written; next poll
+        digest = file_digest(path)
+        if old is not None and old[2] == digest and (old[3] != "failed" or not retry_failed):
+            store.touch(path, st)
+            continue
+        if digest in pending:
+            continue        # a copy of a file in this poll; indexed as duplicate next time
+        dup = store.done_digest(digest)
+        if dup is not None:
+            store.record(path, st, digest, "duplicate", *dup, added=0)
+            print(f"[watch] {path}: same contents as an ingested statement", file=log)
+            continue
+        todo.append((path, st, digest))
+        pending.add(digest)
+    store.commit()
+    return todo
+
+def ingest(folder: str, store: IngestStore, workers: int = None, timeout: float = None,
+           settle: float = 0, retry_failed: bool = False, use_cache: bool = True,
+           log=sys.stderr) -> dict:
+    """One poll: extract what changed and add it to the store. Returns counts."""
+    t0   = time.perf_counter()
+    todo = scan(folder, store, settle, retry_failed, log)
+    stats = {"files": len(todo), "failed": 0, "rows": 0, "added": 0}
+    if todo:
+        files = {path: (st, digest) for path, st, digest in todo}
+
+        def on_result(row, frame):
+            st, digest = files[row["file"]]
+            if frame is None:
+                stats["failed"] += 1
+                store.record(row["file"], st, digest, "failed", row["layout"] or None,
+                             error=row["error"])
+            else:
+                account = row["account"]
+                if not account:
+                    print(f"[watch] {row['file']}: no account number on the first page",
+                          file=log)
+                added = store.add(frame, account, os.path.relpath(row["file"], folder))
+                stats["rows"]  += row["rows"]
+                stats["added"] += added
+                store.record(row["file"], st, digest, "done", row["layout"], account,
+                             row["rows"], added)
+            store.commit()      # each finished statement survives an interrupted run
+
+        run_batch(list(files), None, workers, timeout, use_cache=use_cache,
+                  on_result=on_result, log=log)
+    stats["seconds"] = round(time.perf_counter() - t0, 2)
+    return stats
+
+def export_store(store: IngestStore, path: str) -> int:
+    from export import open_writer
+    from extractors import COLUMNS
+    df = store.transactions()
+    with open_writer(path, columns=COLUMNS, source="Cuenta") as out:
+        for account, part in df.groupby("Cuenta", sort=False):
+            out.write(part.drop(columns="Cuenta"), source=account)
+    return out.rows
+
+# ─── command line ────────────────────────────────────────────
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Ingest new statements from a drop folder.")
+    ap.add_argument("folder", help="directory to watch (searched recursively)")
+    ap.add_argument("--db", default="ingest.sqlite", help="index and transaction store")
+    ap.add_argument("-i", "--interval", type=float, default=60, help="seconds between polls")
+    ap.add_argument("--once", action="store_true", help="poll once and exit")
+    ap.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                    help="worker processes (default: CPU count)")
+    ap.add_argument("-t", "--timeout", type=float, default=None,
+                    help="seconds allowed per statement")
+    ap.add_argument("--settle", type=float, default=5,
+                    help="leave files modified this recently for the next poll")
+    ap.add_argument("--retry-failed", action="store_true",
+                    help="extract unchanged files that failed before")
+    ap.add_argument("-e", "--export", metavar="FILE",
+                    help="after a poll that added rows, write the store to .csv/.xlsx/.parquet")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="re-extract even if a cached result exists")
+    args = ap.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        print(f"[watch] not a directory: {args.folder}", file=sys.stderr)
+        return 1
+    with IngestStore(args.db) as store:
+        try:
+            while True:
+                stats = ingest(args.folder, store, args.workers, args.timeout,
+                               0 if args.once else args.settle, args.retry_failed,
+                               use_cache=not args.no_cache)
+                if stats["files"]:
+                    print(f"[watch] {stats['files']} new or changed, {stats['failed']} failed, "
+                          f"{stats['added']}/{stats['rows']} rows added in "
+                          f"{stats['seconds']}s", file=sys.stderr)
+                if args.export and (stats["added"] or not os.path.exists(args.export)):
+                    export_store(store, args.export)
+                if args.once:
+                    return 1 if stats["failed"] else 0
+                time.sleep(args.interval)
+        except KeyboardInterrupt:
+            return 0
+
+if __name__ == "__main__":
+    sys.exit(main())